@@ -2,20 +2,41 @@
 # ps_price_tool.py
 # Streamlit app to pull PlayStation prices by normalizing URLs to store concept pages
 import re
-import json
+import threading
+import orjson
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urljoin
 import requests
+import requests_cache
+from requests.adapters import HTTPAdapter
 from lxml import html
 import pandas as pd
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 APP_TITLE = "PlayStation Price Puller (Concept GraphQL)"
 GRAPHQL = "https://web.np.playstation.com/api/graphql/v1/op"
 HASH_CONCEPT = "eab9d873f90d4ad98fd55f07b6a0a606e6b3925f2d03b70477234b79c1df30b5"
+CONCEPT_RE = re.compile(r"/concept/(\d+)")
+LOCALE_RE = re.compile(r"store\.playstation\.com/(\w{2}-\w{2})/")
+
+CACHE_NAME = ".ps_price_cache"
+CACHE_TTL = 3600  # seconds; store prices move at most a few times a day
 
 # --------- HTTP session ----------
-def make_session(locale: str):
-    s = requests.Session()
+@st.cache_resource(show_spinner=False)
+def make_session(locale: str, slot: int = 0):
+    # One pooled session per (locale, worker slot), kept across reruns. requests.Session
+    # isn't thread-safe (cookie jar, adapters), so the two resolve workers of a run never
+    # share one; they share only the on-disk SQLite cache, which requests-cache locks.
+    # The locale headers are part of the cache key since GraphQL varies by them.
+    s = requests_cache.CachedSession(
+        CACHE_NAME, backend="sqlite", expire_after=CACHE_TTL,
+        match_headers=["Accept-Language", "x-psn-store-locale"],
+    )
+    adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32)
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
     s.headers.update({
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120 Safari/537.36",
         "Accept": "application/json, text/plain, */*",
@@ -40,27 +61,26 @@ def first_store_link(marketing_url: str, session: requests.Session) -> str | Non
     r = session.get(marketing_url, timeout=20)
     r.raise_for_status()
     doc = html.fromstring(r.text)
-    links = [urljoin(marketing_url, a) for a in doc.xpath("//a/@href")]
-    store_links = [u for u in links if "store.playstation.com" in u]
-    # Prefer concept links
-    for u in store_links:
-        if "/concept/" in u:
-            return u.split("?")[0]
-    return store_links[0] if store_links else None
+    # Prefer concept links; let libxml2 do the filtering
+    concept = doc.xpath('//a[contains(@href,"store.playstation.com") and contains(@href,"/concept/")]/@href')
+    if concept:
+        return urljoin(marketing_url, concept[0]).split("?")[0]
+    store_links = doc.xpath('//a[contains(@href,"store.playstation.com")]/@href')
+    return urljoin(marketing_url, store_links[0]) if store_links else None
 
 def concept_from_store_url(store_url: str, session: requests.Session) -> str | None:
-    m = re.search(r"/concept/(\d+)", store_url)
+    # Concept URLs carry the id already; only product pages need a fetch.
+    m = CONCEPT_RE.search(store_url)
     if m:
         return m.group(1)
     # product page → parse breadcrumb to concept link
     r = session.get(store_url, timeout=20)
     r.raise_for_status()
     doc = html.fromstring(r.text)
-    for href in doc.xpath("//a/@href"):
-        if "/concept/" in href:
-            m = re.search(r"/concept/(\d+)", href)
-            if m:
-                return m.group(1)
+    for href in doc.xpath('//a[contains(@href,"/concept/")]/@href'):
+        m = CONCEPT_RE.search(href)
+        if m:
+            return m.group(1)
     return None
 
 def concept_from_any(url: str, session: requests.Session) -> tuple[str | None, str | None]:
@@ -74,7 +94,7 @@ def concept_from_any(url: str, session: requests.Session) -> tuple[str | None, s
         cid = concept_from_store_url(url, session)
         if cid:
             # try to form the locale-specific concept URL from the input
-            m = re.search(r"store\.playstation\.com/(\w{2}-\w{2})/", url)
+            m = LOCALE_RE.search(url)
             locale = m.group(1) if m else "en-US"
             return cid, f"https://store.playstation.com/{locale}/concept/{cid}"
         return None, None
@@ -85,95 +105,78 @@ def concept_from_any(url: str, session: requests.Session) -> tuple[str | None, s
     cid = concept_from_store_url(store, session)
     if not cid:
         return None, None
-    m = re.search(r"store\.playstation\.com/(\w{2}-\w{2})/", store)
+    m = LOCALE_RE.search(store)
     locale = m.group(1) if m else "en-US"
     return cid, f"https://store.playstation.com/{locale}/concept/{cid}"
 
 # ---------- Price fetch ------------
 def prime_cookies(concept_url: str, session: requests.Session):
-    # Visiting the concept URL first helps set country cookies for correct currency
+    # Visiting the concept URL first helps set country cookies for correct currency.
+    # Bypass the response cache: a cached hit replays no Set-Cookie into this jar.
     try:
-        session.get(concept_url, timeout=20)
+        with session.cache_disabled():
+            session.get(concept_url, timeout=20)
     except Exception:
         pass
 
 def fetch_prices_by_concept(concept_id: str, concept_url: str, session: requests.Session) -> dict:
     params = {
         "operationName": "conceptRetrieveForCtasWithPrice",
-        "variables": json.dumps({"conceptId": concept_id}),
-        "extensions": json.dumps({"persistedQuery": {"version": 1, "sha256Hash": HASH_CONCEPT}}),
+        "variables": orjson.dumps({"conceptId": concept_id}).decode(),
+        "extensions": orjson.dumps({"persistedQuery": {"version": 1, "sha256Hash": HASH_CONCEPT}}).decode(),
     }
     headers = {
         "Referer": concept_url,
     }
     r = session.get(GRAPHQL, params=params, headers=headers, timeout=30)
     r.raise_for_status()
-    return r.json()
+    return orjson.loads(r.content)
 
 # ---------- Parsing helpers ---------
+PRICE_FIELDS = ("currencyCode", "basePrice", "discountedPrice", "discountText")
+ROOT_PRICE_KEYS = ("currencyCode", "basePrice", "discountedPrice")
+
+def _str_or_none(v):
+    return str(v) if v is not None else None
+
+def _price_fields(d: dict) -> dict:
+    out = {k: _str_or_none(d.get(k)) for k in PRICE_FIELDS}
+    out["endDate"] = _str_or_none(d.get("endDate")) or _str_or_none(d.get("discountEndDate"))
+    return out
+
+def _first_priced_product(products: list) -> tuple[dict | None, dict | None]:
+    """
+    Return (product, price_source) for the first product carrying a price, in one pass:
+    price fields at the product root, else the first webcta with a currencyCode.
+    """
+    for p in products:
+        # some payloads put price fields at product root
+        if any(k in p for k in ROOT_PRICE_KEYS):
+            return p, p
+        for cta in p.get("webctas") or p.get("webCTAs") or []:
+            pr = cta.get("price") or {}
+            if pr.get("currencyCode"):
+                return p, pr
+    # Fallback: first product fields that look like price
+    if products and products[0].get("price"):
+        return products[0], products[0]["price"]
+    return None, None
+
 def extract_title_and_price(data: dict) -> tuple[str | None, dict | None]:
     """
     Return (title, price_dict) where price_dict has currencyCode, basePrice, discountedPrice, discountText, endDate
     The GraphQL structure can vary; we try a few paths.
     """
-    def get_str(d, key):
-        v = d.get(key)
-        return str(v) if v is not None else None
-
     if not data or "data" not in data:
         return None, None
     # Main payload
     payload = data.get("data", {}).get("conceptRetrieveForCtasWithPrice") or {}
     # Title
     title = payload.get("name") or payload.get("concept", {}).get("name")
-    # Products list
-    products = payload.get("products") or []
-    price = None
-    # Try to find a full-game style product first
-    preferred_types = {"Product", "FullGame", "Game", "Bundle"}
-    for p in products:
-        ptype = p.get("__typename") or p.get("type")
-        # some payloads put price fields at product root
-        if any(k in p for k in ("currencyCode","basePrice","discountedPrice")):
-            price = {
-                "currencyCode": get_str(p, "currencyCode"),
-                "basePrice": get_str(p, "basePrice"),
-                "discountedPrice": get_str(p, "discountedPrice"),
-                "discountText": get_str(p, "discountText"),
-                "endDate": get_str(p, "endDate") or get_str(p, "discountEndDate")
-            }
-            title = title or p.get("name")
-            break
-        # Look for webctas[0].price
-        webctas = p.get("webctas") or p.get("webCTAs") or []
-        for cta in webctas:
-            pr = cta.get("price") or {}
-            if pr.get("currencyCode"):
-                price = {
-                    "currencyCode": get_str(pr, "currencyCode"),
-                    "basePrice": get_str(pr, "basePrice"),
-                    "discountedPrice": get_str(pr, "discountedPrice"),
-                    "discountText": get_str(pr, "discountText"),
-                    "endDate": get_str(pr, "endDate") or get_str(pr, "discountEndDate")
-                }
-                title = title or p.get("name")
-                break
-        if price:
-            break
-    # Fallback: first product fields that look like price
-    if not price and products:
-        p = products[0]
-        pr = p.get("price") or {}
-        if pr:
-            price = {
-                "currencyCode": get_str(pr, "currencyCode"),
-                "basePrice": get_str(pr, "basePrice"),
-                "discountedPrice": get_str(pr, "discountedPrice"),
-                "discountText": get_str(pr, "discountText"),
-                "endDate": get_str(pr, "endDate") or get_str(pr, "discountEndDate")
-            }
-            title = title or p.get("name")
-    return title, price
+    product, source = _first_priced_product(payload.get("products") or [])
+    if source is None:
+        return title, None
+    return title or product.get("name"), _price_fields(source)
 
 # ---------- Streamlit UI -----------
 st.set_page_config(page_title=APP_TITLE, layout="wide")
@@ -189,8 +192,6 @@ col_loc, _ = st.columns([1,3])
 with col_loc:
     locale = st.selectbox("Region/Locale", locales, index=0, help="Controls currency and catalog region")
 
-s = make_session(locale)
-
 default1 = "https://store.playstation.com/en-us/concept/10014149"  # NBA 2K26 (example)
 default2 = "https://www.playstation.com/en-us/games/call-of-duty-black-ops-6/"  # CoD marketing (example)
 
@@ -204,11 +205,12 @@ with st.form("inputs"):
         name2 = st.text_input("Optional Name #2 (override)", value="")
     run = st.form_submit_button("Pull Prices")
 
-@st.cache_data(show_spinner=False)
-def resolve_and_fetch(url: str, override_name: str, locale: str):
+@st.cache_data(show_spinner=False, ttl=CACHE_TTL)
+def resolve_and_fetch(url: str, override_name: str, locale: str, _session: requests.Session):
+    # _session is skipped by st.cache_data hashing; the cache key stays (url, name, locale)
     if not url:
         return None
-    session = make_session(locale)
+    session = _session
     cid, concept_url = concept_from_any(url, session)
     if not cid:
         return {"input_url": url, "error": "Could not resolve conceptId from URL."}
@@ -234,10 +236,14 @@ def resolve_and_fetch(url: str, override_name: str, locale: str):
     return row
 
 if run:
-    rows = []
-    for u, n in [(url1, name1), (url2, name2)]:
-        if u.strip():
-            rows.append(resolve_and_fetch(u.strip(), n.strip(), locale))
+    inputs = [(u.strip(), n.strip()) for u, n in [(url1, name1), (url2, name2)] if u.strip()]
+    jobs = [(u, n, locale, make_session(locale, i)) for i, (u, n) in enumerate(inputs)]
+    # Each input is several sequential round trips; resolve them side by side. The
+    # workers run st.cache_data calls, so they carry this script run's context.
+    ctx = get_script_run_ctx()
+    with ThreadPoolExecutor(max_workers=2,
+                            initializer=lambda: add_script_run_ctx(threading.current_thread(), ctx)) as ex:
+        rows = list(ex.map(lambda a: resolve_and_fetch(*a), jobs))
     if rows:
         df = pd.DataFrame(rows)
         # Clean display
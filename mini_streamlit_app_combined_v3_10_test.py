@@ -7,42 +7,46 @@
 # - Uses the same core fetchers (Steam market mapping, Xbox fallback headers,
 #   PlayStation MSRP + standard/cross-gen selection via page JSON and link hop).
 
-import re, json, time, random, string
-from dataclasses import dataclass, asdict
+import re, asyncio, threading, secrets
+from collections import OrderedDict
+from dataclasses import dataclass, asdict, fields
 from typing import Optional, Tuple
 import pandas as pd
-import requests
+import httpx
+import ijson
+import orjson
 import streamlit as st
-from bs4 import BeautifulSoup
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from lxml import html as lxhtml
 
 st.set_page_config(page_title="Game Pricing – Mini Test v3.10", page_icon="🎮", layout="centered")
 st.title("🎮 Game Pricing – Mini Test v3.10 (Xbox · Steam · PlayStation)")
 
 # ----------------- HTTP basics -----------------
-SESSION = requests.Session()
-ADAPTER = requests.adapters.HTTPAdapter(pool_connections=32, pool_maxsize=32)
-SESSION.mount("https://", ADAPTER); SESSION.mount("http://", ADAPTER)
-
 UA = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124 Safari/537.36"}
 
-def http_get(url, params=None, headers=None, timeout=12, retries=1, backoff=0.35):
+# One async client per run: HTTP/2 lets Steam/Xbox/PS each share a single connection,
+# and the semaphore caps how many jobs are in flight at once.
+CLIENT_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=32)
+MAX_IN_FLIGHT = 20
+
+def make_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(http2=True, headers=UA, timeout=12.0, limits=CLIENT_LIMITS, follow_redirects=True)
+
+async def http_get(client, url, params=None, headers=None, timeout=12, retries=1, backoff=0.35):
     last = None
-    headers = {**UA, **(headers or {})}
     for i in range(retries+1):
         try:
-            r = SESSION.get(url, params=params, headers=headers, timeout=timeout)
+            r = await client.get(url, params=params, headers=headers, timeout=timeout)
             if getattr(r, "status_code", 0) == 200:
                 return r
             last = r
         except Exception as e:
             last = e
-        time.sleep(backoff * (i+1))
+        await asyncio.sleep(backoff * (i+1))
     return last
 
 def _ms_cv():
-    import random, string
-    return "".join(random.choice(string.ascii_letters+string.digits) for _ in range(28))
+    return secrets.token_urlsafe(21)  # 21 random bytes -> 28 url-safe chars
 
 # ----------------- Small helpers -----------------
 @dataclass
@@ -56,6 +60,9 @@ class PriceRow:
     identity: str
     edition: Optional[str]
 
+# Column dtypes for the results frame; declared up front so pandas skips inference.
+PRICE_ROW_DTYPES = {f.name: ("Float64" if f.name == "price" else "string") for f in fields(PriceRow)}
+
 @dataclass
 class MissRow:
     platform: str
@@ -74,107 +81,181 @@ STEAM_CC_MAP = {
     "DE":"FR"
 }
 
-def fetch_steam_price(appid: str, cc_iso: str, title: str) -> Tuple[Optional[PriceRow], Optional[MissRow]]:
+def _steam_row(node, appid: str, cc_iso: str, title: str) -> Tuple[Optional[PriceRow], Optional[MissRow]]:
+    if not node.get("success"):
+        return None, MissRow("Steam", title, cc_iso, "no_data")
+    pov = (node.get("data") or {}).get("price_overview") or {}
+    cents = pov.get("initial") or pov.get("final")
+    if cents:
+        price = round(cents/100.0, 2)
+        ccy = (pov.get("currency") or "").upper() or None
+        return PriceRow("Steam", title, cc_iso.upper(), ccy, price,
+                        f"https://store.steampowered.com/app/{appid}", f"steam:{appid}", "Standard"), None
+    return None, MissRow("Steam", title, cc_iso, "no_price")
+
+async def fetch_steam_prices_batch(client, items, cc_iso: str):
+    """One appdetails call for every (title, appid) in a market; returns [(PriceRow|None, MissRow|None)]."""
     cc_eff = STEAM_CC_MAP.get(cc_iso.upper(), cc_iso.upper())
+    # Steam only accepts a comma-separated appids list together with filters=price_overview.
     try:
-        r = http_get("https://store.steampowered.com/api/appdetails",
-                     params={"appids": appid, "cc": cc_eff, "l": "en"}, timeout=10, retries=1)
-        j = r.json()
-        node = j.get(str(appid), {})
-        if not node.get("success"):
-            return None, MissRow("Steam", title, cc_iso, "no_data")
-        pov = (node.get("data") or {}).get("price_overview") or {}
-        cents = pov.get("initial") or pov.get("final")
-        if cents:
-            price = round(cents/100.0, 2)
-            ccy = (pov.get("currency") or "").upper() or None
-            return PriceRow("Steam", title, cc_iso.upper(), ccy, price,
-                            f"https://store.steampowered.com/app/{appid}", f"steam:{appid}", "Standard"), None
-        return None, MissRow("Steam", title, cc_iso, "no_price")
+        r = await http_get(client, "https://store.steampowered.com/api/appdetails",
+                     params={"appids": ",".join(appid for _, appid in items), "cc": cc_eff, "l": "en",
+                             "filters": "price_overview"}, timeout=10, retries=1)
+        j = orjson.loads(r.content)
+        if isinstance(j, dict):
+            return [_steam_row(j.get(str(appid)) or {}, appid, cc_iso, title) for title, appid in items]
     except Exception:
-        return None, MissRow("Steam", title, cc_iso, "exception")
+        pass
+    return [(None, MissRow("Steam", title, cc_iso, "exception")) for title, _ in items]
 
 # ----------------- Xbox -----------------
 XBOX_LOCALE = {"US":"en-us","AU":"en-au","DE":"de-de"}
 def xbox_locale(cc): return XBOX_LOCALE.get(cc.upper(),"en-us")
 
-def parse_xbox_price(payload):
-    try:
-        prods = payload.get("Products") or payload.get("products") or []
-        if not prods: return None, None
-        p0 = prods[0]
-        for sku in p0.get("DisplaySkuAvailabilities",[]) or p0.get("displaySkuAvailabilities",[]):
-            for av in sku.get("Availabilities",[]) or sku.get("availabilities",[]):
-                pr = (av.get("OrderManagementData") or av.get("orderManagementData") or {}).get("Price") or {}
-                amt = pr.get("MSRP") or pr.get("ListPrice") or pr.get("msrp") or pr.get("listPrice")
-                ccy = pr.get("CurrencyCode") or pr.get("currencyCode")
-                if amt: return float(amt), (ccy and str(ccy).upper())
-    except Exception:
-        pass
+# Price objects under each product, matched case-insensitively (the API mixes Pascal/camel case);
+# the parser stops at the end of the first product.
+XBOX_PRODUCT_PREFIX = "products.item"
+XBOX_PRICE_PREFIX = "products.item.displayskuavailabilities.item.availabilities.item.ordermanagementdata.price"
+
+def _xbox_amount(pr):
+    amt = pr.get("MSRP") or pr.get("ListPrice") or pr.get("msrp") or pr.get("listPrice")
+    ccy = pr.get("CurrencyCode") or pr.get("currencyCode")
+    return (float(amt), (ccy and str(ccy).upper())) if amt else (None, None)
+
+class _AsyncBody:
+    """Async file-like view of an httpx stream so ijson can pull chunks as they arrive."""
+    def __init__(self, resp): self._chunks = resp.aiter_bytes()
+    async def read(self, n=-1):
+        # ijson probes the return type with read(0); answer it without consuming a chunk
+        return b"" if n == 0 else await anext(self._chunks, b"")
+
+async def parse_xbox_price(resp):
+    # Stream the catalog payload and stop at the first priced availability of the first product;
+    # only the tiny Price object is ever materialised.
+    builder = None
+    async for prefix, event, value in ijson.parse(_AsyncBody(resp), use_float=True):
+        if builder is None:
+            if event == "start_map" and prefix.lower() == XBOX_PRICE_PREFIX:
+                builder = ijson.ObjectBuilder()
+                builder.event(event, value)
+            elif event == "end_map" and prefix.lower() == XBOX_PRODUCT_PREFIX:
+                break  # only the first product is priced
+            continue
+        builder.event(event, value)
+        if event == "end_map" and prefix.lower() == XBOX_PRICE_PREFIX:
+            amt, ccy = _xbox_amount(builder.value)
+            if amt: return amt, ccy
+            builder = None
     return None, None
 
-def fetch_xbox_price(title: str, store_id: str, cc_iso: str):
+async def fetch_xbox_price(client, title: str, store_id: str, cc_iso: str, retries=1, backoff=0.35):
     loc = xbox_locale(cc_iso)
     headers = {"MS-CV": _ms_cv(), "Accept":"application/json", "Referer":"https://www.xbox.com"}
+    params = {"bigIds":store_id,"market":cc_iso.upper(),"locale":loc}
     # primary
-    r = http_get("https://storeedgefd.dsx.mp.microsoft.com/v9.0/sdk/products",
-                 params={"bigIds":store_id,"market":cc_iso.upper(),"locale":loc},
-                 headers=headers, timeout=10, retries=1)
-    try:
-        if hasattr(r, "json"):
-            amt, ccy = parse_xbox_price(r.json())
-            if amt:
-                return PriceRow("Xbox", title, cc_iso.upper(), ccy, float(amt),
-                                f"https://www.xbox.com/{loc.split('-')[0]}/games/store/x/{store_id}", f"xbox:{store_id}", "Standard"), None
-    except Exception:
-        pass
+    for i in range(retries+1):
+        try:
+            async with client.stream("GET", "https://storeedgefd.dsx.mp.microsoft.com/v9.0/sdk/products",
+                                     params=params, headers=headers, timeout=10) as r:
+                if r.status_code == 200:
+                    amt, ccy = await parse_xbox_price(r)
+                    if amt:
+                        return PriceRow("Xbox", title, cc_iso.upper(), ccy, amt,
+                                        f"https://www.xbox.com/{loc.split('-')[0]}/games/store/x/{store_id}", f"xbox:{store_id}", "Standard"), None
+                    break
+        except Exception:
+            pass
+        await asyncio.sleep(backoff * (i+1))
     return None, MissRow("Xbox", title, cc_iso, "no_price")
 
 # ----------------- PlayStation -----------------
 PRODUCT_ID_RE = re.compile(r"/product/([^/?#]+)")
 CROSSED_RE = re.compile(r"<del[^>]*>(.*?)</del>", re.I|re.S)
+NEXT_DATA_RE = re.compile(r'<script id="__NEXT_DATA__"[^>]*>(.*?)</script>', re.S)
+NUM_CLEAN_RE = re.compile(r"[^\d.]")
 
 NEGATIVE_EDITIONS = ["deluxe","ultimate","premium","super","vault","gold","mvp","champion","bundle"]
 PREFER_EDITIONS  = ["standard","standard edition","cross-gen","cross gen","crossgen","base game"]
 
-def _html(url, locale=None):
+async def _html(client, url, locale=None):
     h = {"Accept":"text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8", "User-Agent": UA["User-Agent"]}
     if locale:
         lang = locale.split("-")[0]
         h["Accept-Language"] = f"{lang}-{locale.split('-')[-1].upper()},{lang};q=0.8"
-    r = http_get(url, headers=h, timeout=10, retries=1)
+    r = await http_get(client, url, headers=h, timeout=10, retries=1)
     try: return r.text if hasattr(r,'text') and r.status_code==200 else None
     except Exception: return None
 
+def _parse_tree(html):
+    try: return lxhtml.fromstring(html) if html else None
+    except Exception: return None
+
 def _next_json(html):
-    soup = BeautifulSoup(html, "html.parser")
-    tag = soup.find("script", id="__NEXT_DATA__", type="application/json")
-    if not tag or not tag.string: return None
-    try: return json.loads(tag.string)
+    # Fast path: the blob is one script tag, so a regex scan beats building a tree.
+    m = NEXT_DATA_RE.search(html or "")
+    if m:
+        try: return orjson.loads(m.group(1))
+        except Exception: pass
+    tree = _parse_tree(html)
+    if tree is None: return None
+    s = tree.xpath('//script[@id="__NEXT_DATA__"][@type="application/json"]/text()')
+    if not s: return None
+    try: return orjson.loads(str(s[0]))
     except Exception: return None
 
+PAGE_CACHE_SIZE = 256
+
+@st.cache_resource(show_spinner=False, ttl=3600)
+def _page_cache():
+    # (url, locale) -> (html, next_json); survives reruns so toggling options doesn't refetch.
+    return OrderedDict(), threading.Lock()
+
+async def _page(client, url, locale):
+    cache, lock = _page_cache()
+    key = (url, locale)
+    with lock:
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+    html = await _html(client, url, locale)
+    if not html:
+        return None, None
+    hit = (html, _next_json(html))
+    with lock:
+        cache[key] = hit
+        if len(cache) > PAGE_CACHE_SIZE:
+            cache.popitem(last=False)
+    return hit
+
 def _num(x):
+    if x is None: return None
+    # GraphQL/orjson usually hand us real numbers; skip the string scrubbing for those.
+    if isinstance(x, (int, float)) and not isinstance(x, bool): return float(x)
     try:
-        if x is None: return None
-        s = str(x).replace("\xa0","").replace(" ","").replace(",",".")
-        return float(re.sub(r"[^\d.]", "", s)) if s else None
+        s = NUM_CLEAN_RE.sub("", str(x).replace(",","."))
+        return float(s) if s else None
     except Exception: return None
 
+# Substring semantics as before (no word boundaries), one C-level scan per group.
+CROSSGEN_RE = re.compile(r"cross[- ]?gen", re.I)
+STANDARD_RE = re.compile(r"standard|base game", re.I)
+NEGATIVE_RE = re.compile("|".join(map(re.escape, NEGATIVE_EDITIONS)), re.I)
+
 def _score_edition(text:str)->int:
-    t=(text or "").lower()
+    t=text or ""
     score=0
-    if any(k in t for k in ["cross-gen","cross gen","crossgen"]): score += 200
-    if any(k in t for k in ["standard","standard edition","base game"]): score += 150
-    if score==0 and any(k in t for k in NEGATIVE_EDITIONS): score -= 100
+    if CROSSGEN_RE.search(t): score += 200
+    if STANDARD_RE.search(t): score += 150
+    if score==0 and NEGATIVE_RE.search(t): score -= 100
     return score
 
 def _find_preferred_product_link(html:str, locale:str)->Tuple[Optional[str], Optional[str]]:
-    soup = BeautifulSoup(html or "", "html.parser")
+    tree = _parse_tree(html)
+    if tree is None: return None, None
     best=(None,None,-999)
-    for a in soup.find_all("a", href=True):
-        href=a["href"]
-        if "/product/" not in href: continue
-        label=a.get_text(" ", strip=True) or a.get("aria-label","")
+    for a in tree.xpath('//a[contains(@href,"/product/")]'):
+        href=a.get("href")
+        label=" ".join(t for t in (x.strip() for x in a.itertext()) if t) or a.get("aria-label","")
         s=_score_edition(label)
         if s>best[2]:
             full = f"https://store.playstation.com/{locale}{href}" if href.startswith("/") else href
@@ -186,16 +267,15 @@ def _find_preferred_product_link(html:str, locale:str)->Tuple[Optional[str], Opt
 PS_CCY_MAP={"US":"USD","AU":"AUD","DE":"EUR"}
 PS_LOCALE={"US":"en-us","AU":"en-au","DE":"de-de"}
 
-def fetch_playstation_price(ps_url: str, cc_iso: str, title: str, prefer_msrp=True):
+async def fetch_playstation_price(client, ps_url: str, cc_iso: str, title: str, prefer_msrp=True):
     loc = PS_LOCALE.get(cc_iso.upper(),"en-us")
     url = ps_url
 
     # Load page
-    html = _html(url, loc)
+    html, j = await _page(client, url, loc)
     if not html:
         return None, MissRow("PlayStation", title, cc_iso, "no_html")
 
-    j = _next_json(html)
     msrp=price=curr=None; edition_label=None
     if j:
         try:
@@ -213,20 +293,18 @@ def fetch_playstation_price(ps_url: str, cc_iso: str, title: str, prefer_msrp=Tr
     if ("deluxe" in label_for_score.lower() or "ultimate" in label_for_score.lower() or "bundle" in label_for_score.lower()) or (edition_label=="" and "productList" in (j or {})):
         href, lab = _find_preferred_product_link(html, loc)
         if href and href!=url:
-            html2=_html(href, loc)
-            if html2:
-                j2=_next_json(html2)
-                if j2:
-                    try:
-                        props=j2.get("props",{}).get("pageProps",{}); product=props.get("product") or {}
-                        edition_label=product.get("edition") or product.get("badge") or lab or "Standard"
-                        pb=product.get("price") or {}
-                        msrp=_num(pb.get("basePrice") or pb.get("regularPrice") or pb.get("originalPrice")) or msrp
-                        price=_num(pb.get("discountedPrice") or pb.get("finalPrice") or pb.get("current") or pb.get("value") or pb.get("priceValue")) or price
-                        curr=(pb.get("currency") or pb.get("priceCurrency") or curr)
-                        if isinstance(curr,str): curr=curr.upper()
-                        url=href
-                    except Exception: pass
+            html2, j2 = await _page(client, href, loc)
+            if j2:
+                try:
+                    props=j2.get("props",{}).get("pageProps",{}); product=props.get("product") or {}
+                    edition_label=product.get("edition") or product.get("badge") or lab or "Standard"
+                    pb=product.get("price") or {}
+                    msrp=_num(pb.get("basePrice") or pb.get("regularPrice") or pb.get("originalPrice")) or msrp
+                    price=_num(pb.get("discountedPrice") or pb.get("finalPrice") or pb.get("current") or pb.get("value") or pb.get("priceValue")) or price
+                    curr=(pb.get("currency") or pb.get("priceCurrency") or curr)
+                    if isinstance(curr,str): curr=curr.upper()
+                    url=href
+                except Exception: pass
 
     # MSRP from <del> if needed
     if (msrp is None) and prefer_msrp:
@@ -241,6 +319,30 @@ def fetch_playstation_price(ps_url: str, cc_iso: str, title: str, prefer_msrp=Tr
         return PriceRow("PlayStation", title, cc_iso.upper(), chosen_currency, float(chosen_amount), url, f"ps:{title}", edition_label or "Standard"), None
     return None, MissRow("PlayStation", title, cc_iso, "no_price")
 
+async def run_jobs(jobs, prefer_msrp, on_progress=None):
+    """
+    Fan all (platform, cc, title, ident) jobs out over one client; returns [(PriceRow|None, MissRow|None)].
+    Steam jobs are per market: title is None and ident is the [(title, appid)] basket.
+    """
+    sem = asyncio.Semaphore(MAX_IN_FLIGHT)
+    async with make_client() as client:
+        async def one(plat, cc, title, ident):
+            async with sem:
+                try:
+                    if plat=="Steam": return await fetch_steam_prices_batch(client, ident, cc)
+                    if plat=="Xbox": return [await fetch_xbox_price(client, title, ident, cc)]
+                    return [await fetch_playstation_price(client, ident, cc, title, prefer_msrp)]
+                except Exception:
+                    if plat=="Steam": return [(None, MissRow(plat, t, cc, "exception")) for t, _ in ident]
+                    return [(None, MissRow(plat, title, cc, "exception"))]
+        tasks=[one(*job) for job in jobs]
+        out=[]; done=0
+        for fut in asyncio.as_completed(tasks):
+            out.extend(await fut)
+            done+=1
+            if on_progress: on_progress(done/len(tasks))
+        return out
+
 # ----------------- Mini basket -----------------
 MARKETS = ["US","AU","DE"]
 
@@ -269,41 +371,29 @@ if not run:
 else:
     all_jobs = []
     for cc in MARKETS:
-        for t,appid in STEAM_ITEMS: all_jobs.append(("Steam", cc, t, appid))
+        all_jobs.append(("Steam", cc, None, STEAM_ITEMS))
         for t,store in XBOX_ITEMS:  all_jobs.append(("Xbox", cc, t, store))
         for t,url in PS_ITEMS:      all_jobs.append(("PS",    cc, t, url))
 
     prog = st.progress(0.0)
-    rows=[]; misses=[]
-    with ThreadPoolExecutor(max_workers=9) as ex:
-        futs=[]
-        for plat, cc, title, ident in all_jobs:
-            if plat=="Steam": futs.append(ex.submit(fetch_steam_price, ident, cc, title))
-            elif plat=="Xbox": futs.append(ex.submit(fetch_xbox_price, title, ident, cc))
-            else: futs.append(ex.submit(fetch_playstation_price, ident, cc, title, prefer_msrp))
-        total=len(futs)
-        done=0
-        for f in as_completed(futs):
-            try:
-                pr, ms = f.result()
-            except Exception:
-                pr, ms = None, MissRow("unknown","unknown","unknown","exception")
-            if pr: rows.append(pr)
-            if ms: misses.append(ms)
-            done+=1; prog.progress(done/total)
-
-    df = pd.DataFrame([asdict(r) for r in rows])
+    cols={name: [] for name in PRICE_ROW_DTYPES}; misses=[]
+    for pr, ms in asyncio.run(run_jobs(all_jobs, prefer_msrp, prog.progress)):
+        if pr:
+            for name, col in cols.items(): col.append(getattr(pr, name))
+        if ms: misses.append(ms)
+
+    df = pd.DataFrame({name: pd.array(col, dtype=PRICE_ROW_DTYPES[name]) for name, col in cols.items()})
     st.subheader("Results (raw)")
     st.dataframe(df, use_container_width=True)
 
     st.subheader("Diagnostics")
     if not df.empty:
         st.write("Success counts by platform:")
-        st.write(df.groupby("platform")["country"].count().rename("rows").reset_index())
+        st.write(df["platform"].value_counts().rename_axis("platform").reset_index(name="rows"))
     if misses:
         md = pd.DataFrame([asdict(m) for m in misses])
         st.write("First reasons by platform:")
-        st.write(md.groupby(["platform","reason"]).size().rename("count").reset_index())
+        st.write(md.value_counts(["platform","reason"]).reset_index(name="count"))
     else:
         st.write("No misses 🎉")
 
@@ -7,16 +7,21 @@
 # 2. Drag it into your GitHub repository (replace your old streamlit_app.py)
 # 3. Streamlit will automatically detect and deploy it
 
-import json
 import re
+import asyncio
+from contextlib import asynccontextmanager
+import queue
+import sqlite3
+import threading
 import time
-import random
+import secrets
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
 
+import httpx
+import ijson
+import orjson
 import requests
-from bs4 import BeautifulSoup
 import pandas as pd
 import streamlit as st
 
@@ -30,117 +35,180 @@ st.set_page_config(
     layout="wide"
 )
 
-# Country display names
-COUNTRY_NAMES: Dict[str, str] = {
-    "US": "United States", "CA": "Canada", "MX": "Mexico", "BR": "Brazil",
-    "AR": "Argentina", "CL": "Chile", "CO": "Colombia", "PE": "Peru",
-    "UY": "Uruguay", "CR": "Costa Rica", "GB": "United Kingdom", "IE": "Ireland",
-    "FR": "France", "DE": "Germany", "IT": "Italy", "ES": "Spain", "PT": "Portugal",
-    "NL": "Netherlands", "BE": "Belgium", "AT": "Austria", "CH": "Switzerland",
-    "DK": "Denmark", "SE": "Sweden", "NO": "Norway", "FI": "Finland", "PL": "Poland",
-    "CZ": "Czechia", "SK": "Slovakia", "HU": "Hungary", "GR": "Greece",
-    "TR": "Turkey", "IL": "Israel", "SA": "Saudi Arabia", "AE": "United Arab Emirates",
-    "QA": "Qatar", "KW": "Kuwait", "JP": "Japan", "KR": "South Korea", "TW": "Taiwan",
-    "HK": "Hong Kong", "SG": "Singapore", "MY": "Malaysia", "TH": "Thailand",
-    "ID": "Indonesia", "PH": "Philippines", "VN": "Vietnam", "IN": "India",
-    "AU": "Australia", "NZ": "New Zealand", "KZ": "Kazakhstan", "UA": "Ukraine",
-    "CN": "China", "ZA": "South Africa", "RU": "Russia"
+# One row per country: display name plus each platform's market code/locale and
+# currency, None where the platform doesn't sell there
+COUNTRY_COLUMNS = ["code", "name", "steam_cc", "steam_ccy", "xbox_locale", "xbox_ccy", "ps_locale", "ps_ccy"]
+COUNTRY_ROWS = [
+    ("US", "United States",        "US", "USD", "en-us", "USD", "en-us", "USD"),
+    ("CA", "Canada",               "CA", "CAD", "en-ca", "CAD", "en-ca", "CAD"),
+    ("MX", "Mexico",               "MX", "MXN", "es-mx", "MXN", "es-mx", "USD"),
+    ("BR", "Brazil",               "BR", "BRL", "pt-br", "BRL", "pt-br", "BRL"),
+    ("AR", "Argentina",            "AR", "USD", "es-ar", "ARS", "es-ar", "USD"),
+    ("CL", "Chile",                "CL", "CLP", "es-cl", "CLP", "es-cl", "USD"),
+    ("CO", "Colombia",             "CO", "COP", "es-co", "COP", "es-co", "USD"),
+    ("PE", "Peru",                 "PE", "PEN", "es-pe", "PEN", "es-pe", "USD"),
+    ("UY", "Uruguay",              "UY", "UYU", None,    None,  "es-uy", "USD"),
+    ("CR", "Costa Rica",           "CR", "CRC", "es-cr", "CRC", "es-cr", "USD"),
+    ("GB", "United Kingdom",       "GB", "GBP", "en-gb", "GBP", "en-gb", "GBP"),
+    ("IE", "Ireland",              None, None,  "en-ie", "EUR", "en-ie", "EUR"),
+    ("FR", "France",               "FR", "EUR", "fr-fr", "EUR", "fr-fr", "EUR"),
+    ("DE", "Germany",              "FR", "EUR", "de-de", "EUR", "de-de", "EUR"),
+    ("IT", "Italy",                "FR", "EUR", "it-it", "EUR", "it-it", "EUR"),
+    ("ES", "Spain",                "FR", "EUR", "es-es", "EUR", "es-es", "EUR"),
+    ("PT", "Portugal",             "FR", "EUR", "pt-pt", "EUR", "pt-pt", "EUR"),
+    ("NL", "Netherlands",          "FR", "EUR", "nl-nl", "EUR", "nl-nl", "EUR"),
+    ("BE", "Belgium",              "FR", "EUR", "fr-fr", "EUR", "fr-be", "EUR"),
+    ("AT", "Austria",              "FR", "EUR", "de-at", "EUR", "de-at", "EUR"),
+    ("CH", "Switzerland",          "CH", "CHF", "de-ch", "CHF", "de-ch", "CHF"),
+    ("DK", "Denmark",              "FR", "EUR", None,    None,  "da-dk", "DKK"),
+    ("SE", "Sweden",               "FR", "EUR", "sv-se", "SEK", "sv-se", "SEK"),
+    ("NO", "Norway",               "NO", "NOK", "nb-no", "NOK", "no-no", "NOK"),
+    ("FI", "Finland",              "FR", "EUR", "fi-fi", "EUR", "fi-fi", "EUR"),
+    ("PL", "Poland",               "PL", "PLN", "pl-pl", "PLN", "pl-pl", "PLN"),
+    ("CZ", "Czechia",              "FR", "EUR", "cs-cz", "CZK", "cs-cz", "CZK"),
+    ("SK", "Slovakia",             "FR", "EUR", "sk-sk", "EUR", "sk-sk", "USD"),
+    ("HU", "Hungary",              "FR", "EUR", "hu-hu", "HUF", "hu-hu", "HUF"),
+    ("GR", "Greece",               "FR", "EUR", "el-gr", "EUR", "el-gr", "EUR"),
+    ("TR", "Turkey",               "TR", "USD", "tr-tr", "TRY", "tr-tr", "TRY"),
+    ("IL", "Israel",               "IL", "ILS", "he-il", "ILS", "he-il", "ILS"),
+    ("SA", "Saudi Arabia",         "SA", "SAR", "ar-sa", "SAR", "ar-sa", "USD"),
+    ("AE", "United Arab Emirates", "AE", "AED", "ar-ae", "AED", "ar-ae", "USD"),
+    ("QA", "Qatar",                "QA", "QAR", "ar-qa", "QAR", None,    None),
+    ("KW", "Kuwait",               "KW", "KWD", "ar-kw", "KWD", None,    None),
+    ("JP", "Japan",                "JP", "JPY", "ja-jp", "JPY", "ja-jp", "JPY"),
+    ("KR", "South Korea",          "KR", "KRW", "ko-kr", "KRW", "ko-kr", "KRW"),
+    ("TW", "Taiwan",               "TW", "TWD", "zh-tw", "TWD", "zh-tw", "TWD"),
+    ("HK", "Hong Kong",            "HK", "HKD", "zh-hk", "HKD", "zh-hk", "HKD"),
+    ("SG", "Singapore",            "SG", "SGD", "en-sg", "SGD", "en-sg", "SGD"),
+    ("MY", "Malaysia",             "MY", "MYR", "en-my", "MYR", "en-my", "MYR"),
+    ("TH", "Thailand",             "TH", "THB", "th-th", "THB", "th-th", "THB"),
+    ("ID", "Indonesia",            "ID", "IDR", "id-id", "IDR", "id-id", "IDR"),
+    ("PH", "Philippines",          "PH", "PHP", "en-ph", "PHP", "en-ph", "PHP"),
+    ("VN", "Vietnam",              "VN", "VND", "vi-vn", "VND", "vi-vn", "USD"),
+    ("IN", "India",                "IN", "INR", "en-in", "INR", "en-in", "INR"),
+    ("AU", "Australia",            "AU", "AUD", "en-au", "AUD", "en-au", "AUD"),
+    ("NZ", "New Zealand",          "NZ", "NZD", "en-nz", "NZD", "en-nz", "NZD"),
+    ("KZ", "Kazakhstan",           "KZ", "KZT", "kk-kz", "KZT", None,    None),
+    ("UA", "Ukraine",              "UA", "UAH", "uk-ua", "UAH", "uk-ua", "UAH"),
+    ("CN", "China",                "CN", "CNY", None,    None,  None,    None),
+    ("ZA", "South Africa",         "ZA", "ZAR", "en-za", "ZAR", "en-za", "ZAR"),
+    ("RU", "Russia",               "RU", "RUB", "ru-ru", "RUB", None,    None),
+]
+
+COUNTRIES_DF = pd.DataFrame(COUNTRY_ROWS, columns=COUNTRY_COLUMNS).set_index("code")
+
+# Countries each platform is pulled for
+STEAM_MARKETS = COUNTRIES_DF["steam_cc"].dropna().to_dict()
+XBOX_MARKETS = COUNTRIES_DF["xbox_locale"].dropna().to_dict()
+PS_MARKETS = COUNTRIES_DF["ps_locale"].dropna().to_dict()
+
+# Flat (platform, country) -> (market code/locale, currency) lookup for the fetchers
+PLATFORM_META: Dict[Tuple[str, str], Tuple[str, str]] = {
+    (platform, country): (market, currency)
+    for platform, cols in (("Steam", ["steam_cc", "steam_ccy"]),
+                           ("Xbox", ["xbox_locale", "xbox_ccy"]),
+                           ("PlayStation", ["ps_locale", "ps_ccy"]))
+    for country, market, currency in COUNTRIES_DF[cols].dropna().itertuples()
 }
 
-# Steam country code mappings
-STEAM_MARKETS = {
-    "US": "US", "CA": "CA", "MX": "MX", "BR": "BR", "AR": "AR", "CL": "CL",
-    "CO": "CO", "PE": "PE", "UY": "UY", "CR": "CR", "GB": "GB", "FR": "FR",
-    "DE": "FR", "IT": "FR", "ES": "FR", "PT": "FR", "NL": "FR", "BE": "FR",
-    "AT": "FR", "CH": "CH", "DK": "FR", "SE": "FR", "NO": "NO", "FI": "FR",
-    "PL": "PL", "CZ": "FR", "SK": "FR", "HU": "FR", "GR": "FR", "TR": "TR",
-    "IL": "IL", "SA": "SA", "AE": "AE", "QA": "QA", "KW": "KW", "JP": "JP",
-    "KR": "KR", "TW": "TW", "HK": "HK", "SG": "SG", "MY": "MY", "TH": "TH",
-    "ID": "ID", "PH": "PH", "VN": "VN", "IN": "IN", "AU": "AU", "NZ": "NZ",
-    "KZ": "KZ", "UA": "UA", "CN": "CN", "ZA": "ZA", "RU": "RU"
-}
-
-# Xbox market mappings
-XBOX_MARKETS = {
-    "US": "en-us", "CA": "en-ca", "MX": "es-mx", "BR": "pt-br", "AR": "es-ar",
-    "CL": "es-cl", "CO": "es-co", "PE": "es-pe", "CR": "es-cr", "GB": "en-gb",
-    "IE": "en-ie", "FR": "fr-fr", "DE": "de-de", "IT": "it-it", "ES": "es-es",
-    "PT": "pt-pt", "NL": "nl-nl", "BE": "fr-fr", "AT": "de-at", "CH": "de-ch",
-    "SE": "sv-se", "NO": "nb-no", "FI": "fi-fi", "PL": "pl-pl", "CZ": "cs-cz",
-    "SK": "sk-sk", "HU": "hu-hu", "GR": "el-gr", "TR": "tr-tr", "IL": "he-il",
-    "SA": "ar-sa", "AE": "ar-ae", "QA": "ar-qa", "KW": "ar-kw", "JP": "ja-jp",
-    "KR": "ko-kr", "TW": "zh-tw", "HK": "zh-hk", "SG": "en-sg", "MY": "en-my",
-    "TH": "th-th", "ID": "id-id", "PH": "en-ph", "VN": "vi-vn", "IN": "en-in",
-    "AU": "en-au", "NZ": "en-nz", "ZA": "en-za", "UA": "uk-ua", "KZ": "kk-kz",
-    "RU": "ru-ru"
-}
-
-# PlayStation locale mappings
-PS_MARKETS = {
-    "US": "en-us", "CA": "en-ca", "MX": "es-mx", "BR": "pt-br", "AR": "es-ar",
-    "CL": "es-cl", "CO": "es-co", "PE": "es-pe", "UY": "es-uy", "CR": "es-cr",
-    "GB": "en-gb", "IE": "en-ie", "FR": "fr-fr", "DE": "de-de", "IT": "it-it",
-    "ES": "es-es", "PT": "pt-pt", "NL": "nl-nl", "BE": "fr-be", "AT": "de-at",
-    "CH": "de-ch", "DK": "da-dk", "SE": "sv-se", "NO": "no-no", "FI": "fi-fi",
-    "PL": "pl-pl", "CZ": "cs-cz", "SK": "sk-sk", "HU": "hu-hu", "GR": "el-gr",
-    "TR": "tr-tr", "IL": "he-il", "SA": "ar-sa", "AE": "ar-ae", "JP": "ja-jp",
-    "KR": "ko-kr", "TW": "zh-tw", "HK": "zh-hk", "SG": "en-sg", "MY": "en-my",
-    "TH": "th-th", "ID": "id-id", "PH": "en-ph", "VN": "vi-vn", "IN": "en-in",
-    "AU": "en-au", "NZ": "en-nz", "ZA": "en-za", "UA": "uk-ua"
-}
-
-# Currency mappings by platform and country
-PLATFORM_CURRENCIES = {
-    "Steam": {
-        "US": "USD", "CA": "CAD", "MX": "MXN", "BR": "BRL", "AR": "USD",
-        "CL": "CLP", "CO": "COP", "PE": "PEN", "UY": "UYU", "CR": "CRC",
-        "GB": "GBP", "FR": "EUR", "DE": "EUR", "IT": "EUR", "ES": "EUR",
-        "PT": "EUR", "NL": "EUR", "BE": "EUR", "AT": "EUR", "CH": "CHF",
-        "DK": "EUR", "SE": "EUR", "NO": "NOK", "FI": "EUR", "PL": "PLN",
-        "CZ": "EUR", "SK": "EUR", "HU": "EUR", "GR": "EUR", "TR": "USD",
-        "IL": "ILS", "SA": "SAR", "AE": "AED", "QA": "QAR", "KW": "KWD",
-        "JP": "JPY", "KR": "KRW", "TW": "TWD", "HK": "HKD", "SG": "SGD",
-        "MY": "MYR", "TH": "THB", "ID": "IDR", "PH": "PHP", "VN": "VND",
-        "IN": "INR", "AU": "AUD", "NZ": "NZD", "KZ": "KZT", "UA": "UAH",
-        "CN": "CNY", "ZA": "ZAR", "RU": "RUB"
-    },
-    "Xbox": {
-        "US": "USD", "CA": "CAD", "MX": "MXN", "BR": "BRL", "AR": "ARS",
-        "CL": "CLP", "CO": "COP", "PE": "PEN", "CR": "CRC", "GB": "GBP",
-        "IE": "EUR", "FR": "EUR", "DE": "EUR", "IT": "EUR", "ES": "EUR",
-        "PT": "EUR", "NL": "EUR", "BE": "EUR", "AT": "EUR", "CH": "CHF",
-        "SE": "SEK", "NO": "NOK", "FI": "EUR", "PL": "PLN", "CZ": "CZK",
-        "SK": "EUR", "HU": "HUF", "GR": "EUR", "TR": "TRY", "IL": "ILS",
-        "SA": "SAR", "AE": "AED", "QA": "QAR", "KW": "KWD", "JP": "JPY",
-        "KR": "KRW", "TW": "TWD", "HK": "HKD", "SG": "SGD", "MY": "MYR",
-        "TH": "THB", "ID": "IDR", "PH": "PHP", "VN": "VND", "IN": "INR",
-        "AU": "AUD", "NZ": "NZD", "ZA": "ZAR", "UA": "UAH", "KZ": "KZT",
-        "RU": "RUB"
-    },
-    "PlayStation": {
-        "US": "USD", "CA": "CAD", "MX": "USD", "BR": "BRL", "AR": "USD",
-        "CL": "USD", "CO": "USD", "PE": "USD", "UY": "USD", "CR": "USD",
-        "GB": "GBP", "IE": "EUR", "FR": "EUR", "DE": "EUR", "IT": "EUR",
-        "ES": "EUR", "PT": "EUR", "NL": "EUR", "BE": "EUR", "AT": "EUR",
-        "CH": "CHF", "DK": "DKK", "SE": "SEK", "NO": "NOK", "FI": "EUR",
-        "PL": "PLN", "CZ": "CZK", "SK": "USD", "HU": "HUF", "GR": "EUR",
-        "TR": "TRY", "IL": "ILS", "SA": "USD", "AE": "USD", "JP": "JPY",
-        "KR": "KRW", "TW": "TWD", "HK": "HKD", "SG": "SGD", "MY": "MYR",
-        "TH": "THB", "ID": "IDR", "PH": "PHP", "VN": "USD", "IN": "INR",
-        "AU": "AUD", "NZ": "NZD", "ZA": "ZAR", "UA": "UAH"
-    }
-}
+# Steam store cc -> the countries priced from it (many markets share a cc, e.g. FR)
+STEAM_CC_COUNTRIES: Dict[str, List[str]] = {}
+for _country in STEAM_MARKETS:
+    if ("Steam", _country) in PLATFORM_META:
+        STEAM_CC_COUNTRIES.setdefault(PLATFORM_META[("Steam", _country)][0], []).append(_country)
 
 DEFAULT_HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
     "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8"
 }
 
+# ============================================================================
+# HTTP CLIENT
+# ============================================================================
+
+STEAM_HOST = "store.steampowered.com"
+XBOX_HOST = "microsoft.com"  # storeedgefd.dsx.mp + displaycatalog.mp
+PS_HOST = "store.playstation.com"
+
+HOST_CONCURRENCY = 100  # in-flight requests allowed per store host
+HOST_RPM = {STEAM_HOST: 200, XBOX_HOST: 300, PS_HOST: 100}  # sustained requests per minute per store host
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class TokenBucket:
+    """Refills at rate_per_min tokens a minute and holds at most a minute's worth, so bursts stay bounded"""
+
+    def __init__(self, rate_per_min: int):
+        self.rate = rate_per_min / 60.0
+        self.capacity = float(rate_per_min)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        # Waiters queue on the lock, so tokens are handed out in arrival order
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class StoreClient:
+    """HTTP/2 client shared by every fetcher across pulls, with a concurrency gate and rate limit per store host"""
+
+    def __init__(self):
+        self.http = httpx.AsyncClient(
+            http2=True,
+            headers=DEFAULT_HEADERS,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+        )
+        self.gates = {host: asyncio.Semaphore(HOST_CONCURRENCY) for host in (STEAM_HOST, XBOX_HOST, PS_HOST)}
+        self.buckets = {host: TokenBucket(rpm) for host, rpm in HOST_RPM.items()}
+
+    async def get(self, host: str, url: str, retries: int = 2, backoff: float = 0.3, **kwargs) -> httpx.Response:
+        """GET through the host's gate and rate limit, retrying 429/5xx and transport errors with exponential backoff"""
+        async with self.gates[host]:
+            for attempt in range(retries + 1):
+                await self.buckets[host].acquire()
+                try:
+                    resp = await self.http.get(url, **kwargs)
+                    if resp.status_code not in RETRY_STATUSES or attempt == retries:
+                        return resp
+                except httpx.TransportError:
+                    if attempt == retries:
+                        raise
+                await asyncio.sleep(backoff * (2 ** attempt))
+
+    @asynccontextmanager
+    async def stream(self, host: str, url: str, retries: int = 2, backoff: float = 0.3, **kwargs):
+        """Streaming GET through the host's gate and rate limit; retries happen before any of the body is handed out"""
+        async with self.gates[host]:
+            for attempt in range(retries + 1):
+                await self.buckets[host].acquire()
+                try:
+                    resp = await self.http.send(self.http.build_request("GET", url, **kwargs), stream=True)
+                except httpx.TransportError:
+                    if attempt == retries:
+                        raise
+                else:
+                    if resp.status_code not in RETRY_STATUSES or attempt == retries:
+                        try:
+                            yield resp
+                        finally:
+                            await resp.aclose()
+                        return
+                    await resp.aclose()
+                await asyncio.sleep(backoff * (2 ** attempt))
+
 # ============================================================================
 # DATA STRUCTURES
 # ============================================================================
 
-@dataclass
+@dataclass(slots=True)
 class PriceData:
     platform: str
     title: str
@@ -150,31 +218,73 @@ class PriceData:
     price_usd: Optional[float]
     diff_vs_us: Optional[str]
 
+# ============================================================================
+# PRICE CACHE
+# ============================================================================
+
+CACHE_PATH = ".pricing_cache.sqlite"
+CACHE_TTL = 1800  # storefront prices move at most hourly
+
+class PriceCache:
+    """SQLite-backed store of fetched prices keyed on (platform, item id, country)"""
+
+    def __init__(self, path: str = CACHE_PATH, ttl: int = CACHE_TTL):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        with self.db:
+            # Caches written before prices kept their currency are just dropped
+            columns = [row[1] for row in self.db.execute("PRAGMA table_info(prices)")]
+            if columns and "currency" not in columns:
+                self.db.execute("DROP TABLE prices")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS prices ("
+                "platform TEXT, item_id TEXT, country TEXT, currency TEXT, price REAL, fetched_at REAL, "
+                "PRIMARY KEY (platform, item_id, country))"
+            )
+
+    def fresh(self) -> Dict[Tuple[str, str, str], Tuple[str, float]]:
+        """All (currency, price) pairs fetched within the TTL, in one query"""
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT platform, item_id, country, currency, price FROM prices WHERE fetched_at > ?",
+                (time.time() - self.ttl,),
+            ).fetchall()
+        return {(platform, item_id, country): (currency, price) for platform, item_id, country, currency, price in rows}
+
+    def put_many(self, rows: List[Tuple[str, str, str, str, float]]):
+        now = time.time()
+        with self.lock, self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO prices VALUES (?, ?, ?, ?, ?, ?)",
+                [(*row, now) for row in rows],
+            )
+
+@st.cache_resource
+def get_price_cache() -> PriceCache:
+    return PriceCache()
+
 # ============================================================================
 # CURRENCY CONVERSION
 # ============================================================================
 
-def fetch_exchange_rates() -> Dict[str, float]:
-    """Fetch current exchange rates with USD as base"""
-    if "exchange_rates" in st.session_state:
-        cache_time = st.session_state.get("rates_timestamp", 0)
-        if time.time() - cache_time < 7200:  # 2 hour cache
-            return st.session_state["exchange_rates"]
-    
+@st.cache_data(ttl=60 * 60 * 24, show_spinner=False)
+def _load_exchange_rates() -> Dict[str, float]:
+    """Download USD-based rates; raises on failure so a bad response is never cached"""
+    resp = requests.get("https://api.exchangerate.host/latest", 
+                      params={"base": "USD"}, timeout=15)
+    resp.raise_for_status()
+    data = resp.json()
     rates = {"USD": 1.0}
+    rates.update({k.upper(): float(v) for k, v in data["rates"].items()})
+    return rates
+
+def fetch_exchange_rates() -> Dict[str, float]:
+    """Fetch current exchange rates with USD as base (shared across sessions for 24h)"""
     try:
-        resp = requests.get("https://api.exchangerate.host/latest", 
-                          params={"base": "USD"}, timeout=15)
-        if resp.status_code == 200:
-            data = resp.json()
-            if "rates" in data:
-                rates.update({k.upper(): float(v) for k, v in data["rates"].items()})
+        return _load_exchange_rates()
     except Exception:
-        pass
-    
-    st.session_state["exchange_rates"] = rates
-    st.session_state["rates_timestamp"] = time.time()
-    return rates
+        return {"USD": 1.0}
 
 def convert_to_usd(amount: Optional[float], currency: str, rates: Dict[str, float]) -> Optional[float]:
     """Convert amount to USD"""
@@ -189,93 +299,121 @@ def convert_to_usd(amount: Optional[float], currency: str, rates: Dict[str, floa
 # STEAM PRICE PULLER
 # ============================================================================
 
+_STEAM_URL_RE = re.compile(r'/app/(\d+)')
+
 def extract_steam_appid(input_str: str) -> Optional[str]:
     """Extract Steam AppID from URL or return as-is if numeric"""
     input_str = input_str.strip()
     if input_str.isdigit():
         return input_str
-    match = re.search(r'/app/(\d+)', input_str)
+    match = _STEAM_URL_RE.search(input_str)
     if match:
         return match.group(1)
     return None
 
-def fetch_steam_price(appid: str, country: str, title: str) -> Optional[PriceData]:
-    """Fetch Steam price for a specific country"""
-    if country not in STEAM_MARKETS:
-        return None
-    
-    cc = STEAM_MARKETS[country]
-    currency = PLATFORM_CURRENCIES["Steam"].get(country, "USD")
-    
+async def fetch_steam_prices_batch(client: StoreClient, cc: str, misses: Dict[str, List[Tuple[str, str]]]) -> List[PriceData]:
+    """Fetch Steam prices for one store cc with a single appdetails call, fanned out to every country that needs them"""
+    nodes = {}
     try:
         url = "https://store.steampowered.com/api/appdetails"
-        params = {"appids": appid, "cc": cc, "l": "en"}
-        resp = requests.get(url, params=params, headers=DEFAULT_HEADERS, timeout=30)
-        data = resp.json().get(str(appid), {})
-        
-        if not data.get("success"):
-            return PriceData("Steam", title, country, currency, None, None, None)
-        
-        game_data = data.get("data", {})
-        price_overview = game_data.get("price_overview", {})
-        
-        price_cents = price_overview.get("initial") or price_overview.get("final")
-        if price_cents and isinstance(price_cents, int) and price_cents > 0:
-            price = round(price_cents / 100.0, 2)
-            return PriceData("Steam", title, country, currency, price, None, None)
-        
+        # Multi-appid requests are only honoured with the price_overview filter
+        appids = ",".join(dict.fromkeys(str(appid) for games in misses.values() for appid, _ in games))
+        params = {"appids": appids, "cc": cc, "l": "en", "filters": "price_overview"}
+        resp = await client.get(STEAM_HOST, url, params=params, timeout=30)
+        nodes = orjson.loads(resp.content)
     except Exception:
         pass
+    if not isinstance(nodes, dict):
+        nodes = {}
+    
+    prices: Dict[str, Optional[float]] = {}
+    for appid in dict.fromkeys(str(appid) for games in misses.values() for appid, _ in games):
+        price = None
+        data = nodes.get(appid)
+        if isinstance(data, dict) and data.get("success"):
+            # Free/unpriced apps come back as an empty list instead of a dict
+            details = data.get("data")
+            price_overview = details.get("price_overview") if isinstance(details, dict) else None
+            if isinstance(price_overview, dict):
+                price_cents = price_overview.get("initial") or price_overview.get("final")
+                if price_cents and isinstance(price_cents, int) and price_cents > 0:
+                    price = round(price_cents / 100.0, 2)
+        prices[appid] = price
     
-    return PriceData("Steam", title, country, currency, None, None, None)
+    return [PriceData("Steam", title, country, PLATFORM_META[("Steam", country)][1], prices[str(appid)], None, None)
+            for country, games in misses.items() for appid, title in games]
 
 # ============================================================================
 # XBOX PRICE PULLER
 # ============================================================================
 
+_XBOX_ID_RE = re.compile(r'/([9][A-Z0-9]{11})', re.IGNORECASE)
+
 def extract_xbox_store_id(input_str: str) -> Optional[str]:
     """Extract Xbox Store ID from URL or return as-is"""
     input_str = input_str.strip()
     if len(input_str) == 12 and input_str[0] == '9':
         return input_str
-    match = re.search(r'/([9][A-Z0-9]{11})', input_str, re.IGNORECASE)
+    match = _XBOX_ID_RE.search(input_str)
     if match:
         return match.group(1).upper()
     return None
 
-def fetch_xbox_price(store_id: str, country: str, title: str) -> Optional[PriceData]:
+XBOX_PRODUCT_PREFIX = "products.item"
+XBOX_PRICE_PREFIX = "products.item.displayskuavailabilities.item.availabilities.item.ordermanagementdata.price"
+
+def _xbox_amount(price_obj: dict):
+    """MSRP (or list price) of one OrderManagementData.Price object, tolerating either key casing"""
+    return price_obj.get("MSRP") or price_obj.get("msrp") or price_obj.get("ListPrice") or price_obj.get("listPrice")
+
+class _AsyncBody:
+    """Async file-like view of an httpx stream so ijson can pull chunks as they arrive"""
+
+    def __init__(self, resp: httpx.Response):
+        self._chunks = resp.aiter_bytes()
+
+    async def read(self, n: int = -1) -> bytes:
+        if n == 0:  # ijson probes the return type with read(0); don't burn a chunk on it
+            return b""
+        return await anext(self._chunks, b"")
+
+async def _stream_xbox_price(resp: httpx.Response) -> Optional[float]:
+    """First priced availability of the first product in a catalog response, parsed incrementally so big bundles aren't materialised"""
+    builder = None
+    async for prefix, event, value in ijson.parse(_AsyncBody(resp), use_float=True):
+        if builder is None:
+            if event == "start_map" and prefix.lower() == XBOX_PRICE_PREFIX:
+                builder = ijson.ObjectBuilder()
+                builder.event(event, value)
+            elif event == "end_map" and prefix.lower() == XBOX_PRODUCT_PREFIX:
+                break  # only the first product is priced
+            continue
+        builder.event(event, value)
+        if event == "end_map" and prefix.lower() == XBOX_PRICE_PREFIX:
+            amt = _xbox_amount(builder.value)
+            if amt:
+                return float(amt)
+            builder = None
+    return None
+
+async def fetch_xbox_price(client: StoreClient, store_id: str, country: str, title: str) -> Optional[PriceData]:
     """Fetch Xbox price for a specific country"""
-    if country not in XBOX_MARKETS:
+    meta = PLATFORM_META.get(("Xbox", country))
+    if meta is None:
         return None
+    locale, currency = meta
     
-    locale = XBOX_MARKETS[country]
-    currency = PLATFORM_CURRENCIES["Xbox"].get(country, "USD")
-    
-    def _ms_cv():
-        return ''.join(random.choices('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789', k=24))
-    
-    headers = {"MS-CV": _ms_cv(), "Accept": "application/json"}
+    # 18 random bytes -> 24 URL-safe chars, straight from os.urandom
+    headers = {"MS-CV": secrets.token_urlsafe(18), "Accept": "application/json"}
     
     # Try StorEdge SDK API (like your working tool)
     try:
         url = "https://storeedgefd.dsx.mp.microsoft.com/v9.0/sdk/products"
         params = {"bigIds": store_id, "market": country, "locale": locale}
-        resp = requests.get(url, params=params, headers=headers, timeout=25)
-        
-        if resp.status_code == 200:
-            payload = resp.json()
-            products = payload.get("Products") or payload.get("products")
-            if products and len(products) > 0:
-                p0 = products[0]
-                skus = p0.get("DisplaySkuAvailabilities") or p0.get("displaySkuAvailabilities") or []
-                for sku in skus:
-                    avails = sku.get("Availabilities") or sku.get("availabilities") or []
-                    for av in avails:
-                        omd = av.get("OrderManagementData") or av.get("orderManagementData") or {}
-                        price_obj = omd.get("Price") or omd.get("price") or {}
-                        amt = price_obj.get("MSRP") or price_obj.get("msrp") or price_obj.get("ListPrice") or price_obj.get("listPrice")
-                        if amt:
-                            return PriceData("Xbox", title, country, currency, float(amt), None, None)
+        async with client.stream(XBOX_HOST, url, params=params, headers=headers, timeout=25) as resp:
+            amt = await _stream_xbox_price(resp) if resp.status_code == 200 else None
+        if amt:
+            return PriceData("Xbox", title, country, currency, amt, None, None)
     except Exception:
         pass
     
@@ -283,22 +421,10 @@ def fetch_xbox_price(store_id: str, country: str, title: str) -> Optional[PriceD
     try:
         url = "https://displaycatalog.mp.microsoft.com/v7.0/products"
         params = {"bigIds": store_id, "market": country, "languages": "en-US", "fieldsTemplate": "Details"}
-        resp = requests.get(url, params=params, headers=headers, timeout=25)
-        
-        if resp.status_code == 200:
-            payload = resp.json()
-            products = payload.get("Products") or payload.get("products")
-            if products and len(products) > 0:
-                p0 = products[0]
-                skus = p0.get("DisplaySkuAvailabilities") or p0.get("displaySkuAvailabilities") or []
-                for sku in skus:
-                    avails = sku.get("Availabilities") or sku.get("availabilities") or []
-                    for av in avails:
-                        omd = av.get("OrderManagementData") or av.get("orderManagementData") or {}
-                        price_obj = omd.get("Price") or omd.get("price") or {}
-                        amt = price_obj.get("MSRP") or price_obj.get("msrp") or price_obj.get("ListPrice") or price_obj.get("listPrice")
-                        if amt:
-                            return PriceData("Xbox", title, country, currency, float(amt), None, None)
+        async with client.stream(XBOX_HOST, url, params=params, headers=headers, timeout=25) as resp:
+            amt = await _stream_xbox_price(resp) if resp.status_code == 200 else None
+        if amt:
+            return PriceData("Xbox", title, country, currency, amt, None, None)
     except Exception:
         pass
     
@@ -308,25 +434,28 @@ def fetch_xbox_price(store_id: str, country: str, title: str) -> Optional[PriceD
 # PLAYSTATION PRICE PULLER
 # ============================================================================
 
+_PS_PRODUCT_RE = re.compile(r'/product/([^/?#]+)')
+
 def extract_ps_product_id(input_str: str) -> Optional[str]:
     """Extract PlayStation Product ID from URL or return as-is"""
     input_str = input_str.strip()
     if not input_str.startswith("http"):
         return input_str
-    match = re.search(r'/product/([^/?#]+)', input_str)
+    match = _PS_PRODUCT_RE.search(input_str)
     if match:
         return match.group(1)
     return None
 
-def parse_ps_next_json(html: str) -> Tuple[Optional[str], Optional[float], Optional[str]]:
-    """Parse PlayStation Next.js JSON data"""
-    soup = BeautifulSoup(html, "html.parser")
-    script = soup.find("script", id="__NEXT_DATA__", type="application/json")
-    if not script or not script.string:
+_NEXT_RE = re.compile(rb'<script[^>]+id="__NEXT_DATA__"[^>]*>(.*?)</script>', re.DOTALL)
+
+def parse_ps_next_json(html: bytes) -> Tuple[Optional[str], Optional[float], Optional[str]]:
+    """Parse PlayStation Next.js JSON data straight from the raw page bytes"""
+    match = _NEXT_RE.search(html)
+    if not match:
         return None, None, None
     
     try:
-        data = json.loads(script.string)
+        data = orjson.loads(match.group(1))
         props = data.get("props", {}).get("pageProps", {})
         product = props.get("product") or props.get("pageData") or props.get("telemetryData") or {}
         
@@ -381,13 +510,12 @@ def parse_ps_next_json(html: str) -> Tuple[Optional[str], Optional[float], Optio
     except Exception:
         return None, None, None
 
-def fetch_ps_price(product_id: str, country: str, title: str) -> Optional[PriceData]:
+async def fetch_ps_price(client: StoreClient, product_id: str, country: str, title: str) -> Optional[PriceData]:
     """Fetch PlayStation price for a specific country"""
-    if country not in PS_MARKETS:
+    meta = PLATFORM_META.get(("PlayStation", country))
+    if meta is None:
         return None
-    
-    locale = PS_MARKETS[country]
-    currency = PLATFORM_CURRENCIES["PlayStation"].get(country, "USD")
+    locale, currency = meta
     
     headers = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
@@ -399,10 +527,10 @@ def fetch_ps_price(product_id: str, country: str, title: str) -> Optional[PriceD
     
     try:
         url = f"https://store.playstation.com/{locale}/product/{product_id}"
-        resp = requests.get(url, headers=headers, timeout=30)
+        resp = await client.get(PS_HOST, url, headers=headers, timeout=30)
         
         if resp.status_code == 200:
-            _, price, parsed_currency = parse_ps_next_json(resp.text)
+            _, price, parsed_currency = parse_ps_next_json(resp.content)
             if price and price > 0:
                 final_currency = parsed_currency.upper() if parsed_currency else currency
                 return PriceData("PlayStation", title, country, final_currency, price, None, None)
@@ -415,86 +543,168 @@ def fetch_ps_price(product_id: str, country: str, title: str) -> Optional[PriceD
 # MAIN PULL ORCHESTRATION
 # ============================================================================
 
+async def _tagged(platform: str, item_ids: List[str], coro):
+    """Await a fetch and label its outcome with its platform and the item ids it covers"""
+    try:
+        return platform, item_ids, await coro
+    except Exception:
+        return platform, item_ids, None
+
+async def _pull_all(client: StoreClient,
+                    cache: PriceCache,
+                    steam_games: List[Tuple[str, str]],
+                    xbox_games: List[Tuple[str, str]],
+                    ps_games: List[Tuple[str, str]],
+                    on_progress: Optional[Callable[[int, int], None]] = None) -> Tuple[List[PriceData], List[PriceData], List[PriceData]]:
+    """Run every (game, country) fetch concurrently on one event loop, skipping cached prices"""
+    cached = cache.fresh()
+    by_platform = {"steam": [], "xbox": [], "ps": []}
+    
+    def hit(key: str, platform: str, item_id: str, country: str, title: str) -> bool:
+        entry = cached.get((platform, item_id, country))
+        if entry is None:
+            return False
+        currency, price = entry
+        by_platform[key].append(PriceData(platform, title, country, currency, price, None, None))
+        return True
+    
+    jobs = []
+    
+    # Steam jobs: one batched appdetails call per store cc for the games uncached in any of its countries
+    if steam_games:
+        for cc, countries in STEAM_CC_COUNTRIES.items():
+            misses = {}
+            for country in countries:
+                todo = [(appid, title) for appid, title in steam_games
+                        if not hit("steam", "Steam", appid, country, title)]
+                if todo:
+                    misses[country] = todo
+            if misses:
+                item_ids = [appid for games in misses.values() for appid, _ in games]
+                jobs.append((fetch_steam_prices_batch(client, cc, misses), "steam", item_ids))
+    
+    # Xbox jobs
+    for store_id, title in xbox_games:
+        for country in XBOX_MARKETS.keys():
+            if not hit("xbox", "Xbox", store_id, country, title):
+                jobs.append((fetch_xbox_price(client, store_id, country, title), "xbox", [store_id]))
+    
+    # PlayStation jobs
+    for product_id, title in ps_games:
+        for country in PS_MARKETS.keys():
+            if not hit("ps", "PlayStation", product_id, country, title):
+                jobs.append((fetch_ps_price(client, product_id, country, title), "ps", [product_id]))
+    
+    # Collect results as they land so one slow request doesn't hold up the rest
+    fetched = []
+    total = len(jobs)
+    tasks = [_tagged(platform, item_ids, coro) for coro, platform, item_ids in jobs]
+    for done, fut in enumerate(asyncio.as_completed(tasks), 1):
+        platform, item_ids, result = await fut
+        rows = result if isinstance(result, list) else [result] if result else []
+        by_platform[platform].extend(rows)
+        fetched.extend((r.platform, item_id, r.country, r.currency, r.price)
+                       for item_id, r in zip(item_ids, rows) if r.price is not None)
+        if on_progress:
+            on_progress(done, total)
+    
+    # Only real prices are cached; misses and failures are retried on the next pull
+    if fetched:
+        cache.put_many(fetched)
+    
+    return by_platform["steam"], by_platform["xbox"], by_platform["ps"]
+
+@st.cache_resource
+def get_store_client() -> Tuple[asyncio.AbstractEventLoop, StoreClient]:
+    """Event loop on a daemon thread plus the StoreClient bound to it, kept alive across reruns"""
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="store-client", daemon=True).start()
+    return loop, StoreClient()
+
 def pull_all_prices(steam_games: List[Tuple[str, str]], 
                    xbox_games: List[Tuple[str, str]], 
                    ps_games: List[Tuple[str, str]],
-                   max_workers: int = 20) -> Tuple[List[PriceData], List[PriceData], List[PriceData]]:
+                   on_progress: Optional[Callable[[int, int], None]] = None) -> Tuple[List[PriceData], List[PriceData], List[PriceData]]:
     """Pull prices for all games across all platforms and regions"""
+    loop, client = get_store_client()
+    updates = queue.SimpleQueue()
+    fut = asyncio.run_coroutine_threadsafe(
+        _pull_all(client, get_price_cache(), steam_games, xbox_games, ps_games, lambda *p: updates.put(p)),
+        loop,
+    )
     
-    steam_results = []
-    xbox_results = []
-    ps_results = []
+    # Streamlit elements can only be touched from the script thread, so relay progress from here
+    while True:
+        try:
+            done, total = updates.get(timeout=0.1)
+        except queue.Empty:
+            if fut.done():
+                break
+            continue
+        if on_progress:
+            on_progress(done, total)
     
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = []
-        
-        # Submit Steam jobs
-        for appid, title in steam_games:
-            for country in STEAM_MARKETS.keys():
-                futures.append((executor.submit(fetch_steam_price, appid, country, title), "steam"))
-        
-        # Submit Xbox jobs
-        for store_id, title in xbox_games:
-            for country in XBOX_MARKETS.keys():
-                futures.append((executor.submit(fetch_xbox_price, store_id, country, title), "xbox"))
-        
-        # Submit PlayStation jobs
-        for product_id, title in ps_games:
-            for country in PS_MARKETS.keys():
-                futures.append((executor.submit(fetch_ps_price, product_id, country, title), "ps"))
-        
-        # Collect results
-        for future_tuple in futures:
-            future, platform = future_tuple
-            try:
-                result = future.result()
-                if result:
-                    if platform == "steam":
-                        steam_results.append(result)
-                    elif platform == "xbox":
-                        xbox_results.append(result)
-                    elif platform == "ps":
-                        ps_results.append(result)
-            except Exception as e:
-                pass
-    
-    return steam_results, xbox_results, ps_results
+    return fut.result()
 
 def process_results(results: List[PriceData], rates: Dict[str, float]) -> pd.DataFrame:
     """Process results into DataFrame with USD conversion and variance"""
     if not results:
         return pd.DataFrame()
     
-    # Convert to USD
-    for r in results:
-        r.price_usd = convert_to_usd(r.price, r.currency, rates)
+    # Build columns straight from the records instead of a dict per row
+    df = pd.DataFrame({
+        "title": [r.title for r in results],
+        "country": [r.country for r in results],
+        "currency": [r.currency for r in results],
+        "price": [r.price for r in results],
+    })
     
-    # Find US baseline
-    us_prices = {}
-    for r in results:
-        if r.country == "US" and r.price_usd:
-            us_prices[r.title] = r.price_usd
+    # Convert to USD (unknown currency or non-positive rate -> no USD price)
+    rate = df["currency"].map(rates)
+    df["price_usd"] = (df["price"].astype(float) / rate.where(rate > 0)).round(2)
+    
+    # Broadcast each title's US price to all of its rows in one groupby pass
+    has_usd = df["price_usd"].notna() & (df["price_usd"] != 0)
+    us_price = df["price_usd"].where(has_usd & (df["country"] == "US")).groupby(df["title"]).transform("last")
     
     # Calculate variance
-    for r in results:
-        if r.price_usd and r.title in us_prices:
-            us_price = us_prices[r.title]
-            if us_price > 0:
-                pct = ((r.price_usd / us_price) - 1) * 100
-                r.diff_vs_us = f"{pct:+.1f}%"
+    pct = (df["price_usd"] / us_price.where(us_price > 0) - 1) * 100
+    df["diff_vs_us"] = pct.where(has_usd).map(lambda x: f"{x:+.1f}%" if pd.notna(x) else None)
     
-    # Convert to DataFrame
-    df = pd.DataFrame([{
-        "Title": r.title,
-        "Country": COUNTRY_NAMES.get(r.country, r.country),
-        "Currency": r.currency,
-        "Local Price": r.price if r.price is not None else None,
-        "USD Price": r.price_usd if r.price_usd is not None else None,
-        "% Diff vs US": r.diff_vs_us if r.diff_vs_us else None
-    } for r in results])
+    # Convert to display columns
+    df = df.join(COUNTRIES_DF["name"], on="country")
+    df = pd.DataFrame({
+        "Title": df["title"],
+        "Country": df["name"].fillna(df["country"]),
+        "Currency": df["currency"],
+        "Local Price": df["price"],
+        "USD Price": df["price_usd"],
+        "% Diff vs US": df["diff_vs_us"],
+    })
     
     return df.sort_values(["Title", "Country"]).reset_index(drop=True)
 
+@st.cache_data(show_spinner=False)
+def df_to_csv_bytes(df: pd.DataFrame) -> bytes:
+    """CSV download payload, re-serialised only when the frame's contents change"""
+    return df.to_csv(index=False).encode("utf-8")
+
+def parse_basket(text: str, extract: Callable[[str], Optional[str]], label: str) -> List[Tuple[str, str]]:
+    """Parse "Title | ID or URL" lines (or bare IDs) into (id, title) pairs with vectorised string ops"""
+    lines = pd.Series(text.strip().split("\n"), dtype=object)
+    lines = lines[lines.str.strip() != ""]
+    if lines.empty:
+        return []
+    
+    parts = lines.str.partition("|")
+    title, sep, rest = parts[0], parts[1], parts[2]
+    piped = sep == "|"
+    ids = rest.str.split("|").str[0].where(piped, lines).map(extract)
+    found = ids.notna() & (ids != "")
+    # Bare IDs get a placeholder title
+    titles = title.str.strip().where(piped, label + " " + ids[found])
+    return list(zip(ids[found], titles[found]))
+
 # ============================================================================
 # STREAMLIT UI
 # ============================================================================
@@ -553,51 +763,9 @@ st.markdown("---")
 
 if st.button("🚀 Pull Prices", type="primary", width='stretch'):
     # Parse inputs with manual titles
-    steam_games = []
-    xbox_games = []
-    ps_games = []
-    
-    # Process Steam
-    for line in steam_input.strip().split("\n"):
-        if "|" in line:
-            parts = line.split("|")
-            title = parts[0].strip()
-            id_part = parts[1].strip()
-            appid = extract_steam_appid(id_part)
-            if appid:
-                steam_games.append((appid, title))
-        elif line.strip():
-            appid = extract_steam_appid(line)
-            if appid:
-                steam_games.append((appid, f"Steam Game {appid}"))
-    
-    # Process Xbox
-    for line in xbox_input.strip().split("\n"):
-        if "|" in line:
-            parts = line.split("|")
-            title = parts[0].strip()
-            id_part = parts[1].strip()
-            store_id = extract_xbox_store_id(id_part)
-            if store_id:
-                xbox_games.append((store_id, title))
-        elif line.strip():
-            store_id = extract_xbox_store_id(line)
-            if store_id:
-                xbox_games.append((store_id, f"Xbox Game {store_id}"))
-    
-    # Process PlayStation
-    for line in ps_input.strip().split("\n"):
-        if "|" in line:
-            parts = line.split("|")
-            title = parts[0].strip()
-            id_part = parts[1].strip()
-            product_id = extract_ps_product_id(id_part)
-            if product_id:
-                ps_games.append((product_id, title))
-        elif line.strip():
-            product_id = extract_ps_product_id(line)
-            if product_id:
-                ps_games.append((product_id, f"PS Game {product_id}"))
+    steam_games = parse_basket(steam_input, extract_steam_appid, "Steam Game")
+    xbox_games = parse_basket(xbox_input, extract_xbox_store_id, "Xbox Game")
+    ps_games = parse_basket(ps_input, extract_ps_product_id, "PS Game")
     
     if not steam_games and not xbox_games and not ps_games:
         st.error("Please enter at least one game for any platform.")
@@ -607,9 +775,12 @@ if st.button("🚀 Pull Prices", type="primary", width='stretch'):
         
         with st.spinner("Fetching prices across all regions..."):
             rates = fetch_exchange_rates()
+            progress = st.progress(0.0)
             steam_results, xbox_results, ps_results = pull_all_prices(
-                steam_games, xbox_games, ps_games
+                steam_games, xbox_games, ps_games,
+                on_progress=lambda done, total: progress.progress(done / total, text=f"{done}/{total} requests")
             )
+            progress.empty()
         
         st.success(f"✅ Price pull complete! Found {len(steam_results)} Steam, {len(xbox_results)} Xbox, {len(ps_results)} PlayStation prices")
         
@@ -620,7 +791,7 @@ if st.button("🚀 Pull Prices", type="primary", width='stretch'):
             st.dataframe(steam_df, width='stretch', height=400)
             st.download_button(
                 "⬇️ Download Steam CSV",
-                steam_df.to_csv(index=False).encode("utf-8"),
+                df_to_csv_bytes(steam_df),
                 "steam_prices.csv",
                 "text/csv"
             )
@@ -632,7 +803,7 @@ if st.button("🚀 Pull Prices", type="primary", width='stretch'):
             st.dataframe(xbox_df, width='stretch', height=400)
             st.download_button(
                 "⬇️ Download Xbox CSV",
-                xbox_df.to_csv(index=False).encode("utf-8"),
+                df_to_csv_bytes(xbox_df),
                 "xbox_prices.csv",
                 "text/csv"
             )
@@ -644,7 +815,7 @@ if st.button("🚀 Pull Prices", type="primary", width='stretch'):
             st.dataframe(ps_df, width='stretch', height=400)
             st.download_button(
                 "⬇️ Download PlayStation CSV",
-                ps_df.to_csv(index=False).encode("utf-8"),
+                df_to_csv_bytes(ps_df),
                 "playstation_prices.csv",
                 "text/csv"
             )
@@ -2,17 +2,27 @@
 # FIXED: PlayStation MSRP priority logic + Debug columns
 # Now correctly prioritizes basePrice (MSRP) over discounted/sale prices
 
+import io
 import json
+import os
 import re
 import time
-import random
-from dataclasses import dataclass
+import secrets
+import asyncio
+import sqlite3
+import threading
+from collections import defaultdict
+from dataclasses import dataclass, fields, replace
 from typing import Dict, List, Optional, Tuple, Any
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
+import httpx
+import orjson
 import requests
-from bs4 import BeautifulSoup
+from lxml import html as lxhtml
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
 import streamlit as st
 
 # ============================================================================
@@ -129,6 +139,21 @@ PLATFORM_CURRENCIES = {
     }
 }
 
+# (store code/locale, currency) per country, so each fetch resolves both in one lookup
+STEAM_CONFIG: Dict[str, Tuple[str, str]] = {c: (cc, PLATFORM_CURRENCIES["Steam"].get(c, "USD")) for c, cc in STEAM_MARKETS.items()}
+XBOX_CONFIG: Dict[str, Tuple[str, str]] = {c: (loc, PLATFORM_CURRENCIES["Xbox"].get(c, "USD")) for c, loc in XBOX_MARKETS.items()}
+PS_CONFIG: Dict[str, Tuple[str, str]] = {c: (loc, PLATFORM_CURRENCIES["PlayStation"].get(c, "USD")) for c, loc in PS_MARKETS.items()}
+
+# Countries each platform actually sells in, fixed at import so pulls never touch the others
+STEAM_COUNTRIES = tuple(STEAM_CONFIG)
+XBOX_COUNTRIES = tuple(XBOX_CONFIG)
+PS_COUNTRIES = tuple(PS_CONFIG)
+
+# Countries served by each Steam store cc (the EU countries all share "FR")
+STEAM_CC_COUNTRIES: Dict[str, List[str]] = {}
+for _country in STEAM_COUNTRIES:
+    STEAM_CC_COUNTRIES.setdefault(STEAM_CONFIG[_country][0], []).append(_country)
+
 DEFAULT_HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
     "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8"
@@ -142,6 +167,49 @@ PS_HEADERS = {
     "Connection": "keep-alive",
 }
 
+# ============================================================================
+# HTTP CLIENT
+# ============================================================================
+
+STEAM_HOST = "store.steampowered.com"
+XBOX_HOST = "microsoft.com"  # storeedgefd.dsx.mp + displaycatalog.mp
+PS_HOST = "store.playstation.com"
+
+HOST_CONCURRENCY = 32  # in-flight requests per store host, to stay clear of their rate limits
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class StoreClient:
+    """Pooled HTTP/2 client shared by every fetcher across pulls, with a concurrency gate per store host"""
+
+    def __init__(self):
+        self.http = httpx.AsyncClient(
+            http2=True,
+            headers=DEFAULT_HEADERS,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=128, max_keepalive_connections=64),
+        )
+        self.gates = {host: asyncio.Semaphore(HOST_CONCURRENCY) for host in (STEAM_HOST, XBOX_HOST, PS_HOST)}
+
+    async def get(self, host: str, url: str, retries: int = 2, backoff: float = 0.3, **kwargs) -> httpx.Response:
+        """GET through the host's gate, retrying 429/5xx and transport errors with exponential backoff"""
+        async with self.gates[host]:
+            for attempt in range(retries + 1):
+                try:
+                    resp = await self.http.get(url, **kwargs)
+                    if resp.status_code not in RETRY_STATUSES or attempt == retries:
+                        return resp
+                except httpx.TransportError:
+                    if attempt == retries:
+                        raise
+                await asyncio.sleep(backoff * (2 ** attempt))
+
+@st.cache_resource(show_spinner=False)
+def get_store_client() -> Tuple[asyncio.AbstractEventLoop, StoreClient]:
+    """Event loop on a daemon thread plus the StoreClient bound to it, so pooled connections survive reruns"""
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="store-client", daemon=True).start()
+    return loop, StoreClient()
+
 # ============================================================================
 # DATA STRUCTURES
 # ============================================================================
@@ -158,17 +226,80 @@ class PriceData:
     price_type: Optional[str] = "API"  # MSRP, Sale Price, Current, API
     source: Optional[str] = None  # next_json, json_ld, meta, api
 
+PRICE_COLUMNS = tuple(f.name for f in fields(PriceData))
+# Low-cardinality columns, stored as pandas categoricals
+CATEGORY_COLUMNS = dict.fromkeys(("platform", "country", "currency", "price_type", "source"), "category")
+
+# ============================================================================
+# PRICE CACHE
+# ============================================================================
+
+CACHE_PATH = ".price_cache.sqlite"
+CACHE_TTL = 3600  # seconds
+
+class PriceCache:
+    """SQLite store of fetched prices keyed on (platform, item id, country)"""
+
+    def __init__(self, path: str = CACHE_PATH, ttl: int = CACHE_TTL):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        with self.db:
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS prices ("
+                "platform TEXT, item_id TEXT, country TEXT, currency TEXT, price REAL, "
+                "price_type TEXT, source TEXT, fetched_at REAL, "
+                "PRIMARY KEY (platform, item_id, country))"
+            )
+            self.db.execute("DELETE FROM prices WHERE fetched_at <= ?", (time.time() - ttl,))
+
+    def fresh(self) -> Dict[Tuple[str, str, str], Tuple[str, float, str, str]]:
+        """All prices fetched within the TTL, in one query"""
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT platform, item_id, country, currency, price, price_type, source FROM prices WHERE fetched_at > ?",
+                (time.time() - self.ttl,),
+            ).fetchall()
+        return {(platform, item_id, country): rest for platform, item_id, country, *rest in rows}
+
+    def put_many(self, rows: List[Tuple[str, str, str, str, float, str, str]]):
+        now = time.time()
+        with self.lock, self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO prices VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(*row, now) for row in rows],
+            )
+
+@st.cache_resource(show_spinner=False)
+def get_price_cache() -> PriceCache:
+    return PriceCache()
+
 # ============================================================================
 # CURRENCY CONVERSION
 # ============================================================================
 
+RATES_PATH = ".rates_cache.json"
+RATES_TTL = 7200  # seconds
+
 def fetch_exchange_rates() -> Dict[str, float]:
     """Fetch current exchange rates with USD as base"""
     if "exchange_rates" in st.session_state:
         cache_time = st.session_state.get("rates_timestamp", 0)
-        if time.time() - cache_time < 7200:
+        if time.time() - cache_time < RATES_TTL:
             return st.session_state["exchange_rates"]
     
+    # Cold start: reuse the on-disk table if it is younger than the TTL
+    try:
+        mtime = os.path.getmtime(RATES_PATH)
+        if time.time() - mtime < RATES_TTL:
+            with open(RATES_PATH, "r", encoding="utf-8") as f:
+                rates = json.load(f)
+            st.session_state["exchange_rates"] = rates
+            st.session_state["rates_timestamp"] = mtime
+            return rates
+    except (OSError, ValueError):
+        pass
+    
     rates = {"USD": 1.0}
     try:
         resp = requests.get("https://api.exchangerate.host/latest", 
@@ -180,6 +311,14 @@ def fetch_exchange_rates() -> Dict[str, float]:
     except Exception:
         pass
     
+    # Only persist a real table, so a failed fetch is retried on the next cold start
+    if len(rates) > 1:
+        try:
+            with open(RATES_PATH, "w", encoding="utf-8") as f:
+                json.dump(rates, f)
+        except OSError:
+            pass
+    
     st.session_state["exchange_rates"] = rates
     st.session_state["rates_timestamp"] = time.time()
     return rates
@@ -197,129 +336,156 @@ def convert_to_usd(amount: Optional[float], currency: str, rates: Dict[str, floa
 # STEAM PRICE PULLER
 # ============================================================================
 
+_STEAM_APPID_RE = re.compile(r'/app/(\d+)')
+
 def extract_steam_appid(input_str: str) -> Optional[str]:
     """Extract Steam AppID from URL or return as-is if numeric"""
     input_str = input_str.strip()
     if input_str.isdigit():
         return input_str
-    match = re.search(r'/app/(\d+)', input_str)
+    match = _STEAM_APPID_RE.search(input_str)
     if match:
         return match.group(1)
     return None
 
-def fetch_steam_price(appid: str, country: str, title: str) -> Optional[PriceData]:
-    """Fetch Steam price for a specific country"""
-    if country not in STEAM_MARKETS:
-        return None
-    
-    cc = STEAM_MARKETS[country]
-    currency = PLATFORM_CURRENCIES["Steam"].get(country, "USD")
+def _steam_amount(entry: dict) -> Optional[float]:
+    """Price from one appdetails entry, preferring the undiscounted price"""
+    game_data = entry.get("data") or {}
+    price_overview = game_data.get("price_overview", {}) if isinstance(game_data, dict) else {}
     
+    price_cents = price_overview.get("initial") or price_overview.get("final")
+    if price_cents and isinstance(price_cents, int) and price_cents > 0:
+        return round(price_cents / 100.0, 2)
+    return None
+
+async def _fetch_steam_raw(client: StoreClient, appid: str, cc: str) -> Optional[float]:
+    """Steam price for one (appid, store cc)"""
     try:
         url = "https://store.steampowered.com/api/appdetails"
         params = {"appids": appid, "cc": cc, "l": "en"}
-        resp = requests.get(url, params=params, headers=DEFAULT_HEADERS, timeout=30)
-        data = resp.json().get(str(appid), {})
-        
-        if not data.get("success"):
-            return PriceData("Steam", title, country, currency, None, None, None, "API", "steam_api")
+        resp = await client.get(STEAM_HOST, url, params=params, timeout=30)
+        data = orjson.loads(resp.content).get(str(appid), {})
         
-        game_data = data.get("data", {})
-        price_overview = game_data.get("price_overview", {})
-        
-        price_cents = price_overview.get("initial") or price_overview.get("final")
-        if price_cents and isinstance(price_cents, int) and price_cents > 0:
-            price = round(price_cents / 100.0, 2)
-            return PriceData("Steam", title, country, currency, price, None, None, "API", "steam_api")
+        if data.get("success"):
+            return _steam_amount(data)
         
     except Exception:
         pass
     
-    return PriceData("Steam", title, country, currency, None, None, None, "API", "steam_api")
+    return None
+
+async def fetch_steam_batch(client: StoreClient, appids: List[str], cc: str) -> Dict[str, Optional[float]]:
+    """Every appid's Steam price for one store cc, in a single appdetails call"""
+    batch: Dict[str, dict] = {}
+    try:
+        url = "https://store.steampowered.com/api/appdetails"
+        # Steam only honours several appids at once with the price_overview filter
+        params = {"appids": ",".join(appids), "cc": cc, "l": "en", "filters": "price_overview"}
+        resp = await client.get(STEAM_HOST, url, params=params, timeout=30)
+        batch = orjson.loads(resp.content) or {}
+    except Exception:
+        pass
+    
+    prices: Dict[str, Optional[float]] = {}
+    retry = []
+    for appid in appids:
+        entry = batch.get(appid) or {}
+        if entry.get("success"):
+            prices[appid] = _steam_amount(entry)
+        else:
+            retry.append(appid)
+    
+    # Apps the batch didn't answer for are retried on their own
+    for appid, price in zip(retry, await asyncio.gather(*(_fetch_steam_raw(client, a, cc) for a in retry))):
+        prices[appid] = price
+    return prices
 
 # ============================================================================
 # XBOX PRICE PULLER
 # ============================================================================
 
+_XBOX_STORE_RE = re.compile(r'/([9][A-Z0-9]{11})', re.IGNORECASE)
+
 def extract_xbox_store_id(input_str: str) -> Optional[str]:
     """Extract Xbox Store ID from URL or return as-is"""
     input_str = input_str.strip()
     if len(input_str) == 12 and input_str[0] == '9':
         return input_str
-    match = re.search(r'/([9][A-Z0-9]{11})', input_str, re.IGNORECASE)
+    match = _XBOX_STORE_RE.search(input_str)
     if match:
         return match.group(1).upper()
     return None
 
-def fetch_xbox_price(store_id: str, country: str, title: str) -> Optional[PriceData]:
-    """Fetch Xbox price for a specific country"""
-    if country not in XBOX_MARKETS:
+# Key path through a product payload, for each casing the Microsoft endpoints answer in
+_XBOX_KEYS = {
+    True: ("Products", "DisplaySkuAvailabilities", "Availabilities", "OrderManagementData", "Price", "MSRP", "ListPrice"),
+    False: ("products", "displaySkuAvailabilities", "availabilities", "orderManagementData", "price", "msrp", "listPrice"),
+}
+
+def _xbox_amount(payload: dict) -> Optional[float]:
+    """MSRP (or list price) of the first product, with the casing detected once from the top-level key"""
+    products_k, skus_k, avails_k, omd_k, price_k, msrp_k, list_k = _XBOX_KEYS["Products" in payload]
+    products = payload.get(products_k)
+    if not products:
         return None
-    
-    locale = XBOX_MARKETS[country]
-    currency = PLATFORM_CURRENCIES["Xbox"].get(country, "USD")
-    
-    def _ms_cv():
-        return ''.join(random.choices('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789', k=24))
-    
-    headers = {"MS-CV": _ms_cv(), "Accept": "application/json"}
+    for sku in products[0].get(skus_k) or []:
+        for av in sku.get(avails_k) or []:
+            price_obj = (av.get(omd_k) or {}).get(price_k) or {}
+            amt = price_obj.get(msrp_k) or price_obj.get(list_k)
+            if amt:
+                return float(amt)
+    return None
+
+async def _fetch_xbox_raw(client: StoreClient, store_id: str, country: str, locale: str) -> Optional[float]:
+    """Xbox price for one (store id, market)"""
+    # 18 random bytes -> 24 URL-safe chars, straight from os.urandom
+    headers = {"MS-CV": secrets.token_urlsafe(18), "Accept": "application/json"}
     
     try:
         url = "https://storeedgefd.dsx.mp.microsoft.com/v9.0/sdk/products"
         params = {"bigIds": store_id, "market": country, "locale": locale}
-        resp = requests.get(url, params=params, headers=headers, timeout=25)
+        resp = await client.get(XBOX_HOST, url, params=params, headers=headers, timeout=25)
         
         if resp.status_code == 200:
-            payload = resp.json()
-            products = payload.get("Products") or payload.get("products")
-            if products and len(products) > 0:
-                p0 = products[0]
-                skus = p0.get("DisplaySkuAvailabilities") or p0.get("displaySkuAvailabilities") or []
-                for sku in skus:
-                    avails = sku.get("Availabilities") or sku.get("availabilities") or []
-                    for av in avails:
-                        omd = av.get("OrderManagementData") or av.get("orderManagementData") or {}
-                        price_obj = omd.get("Price") or omd.get("price") or {}
-                        amt = price_obj.get("MSRP") or price_obj.get("msrp") or price_obj.get("ListPrice") or price_obj.get("listPrice")
-                        if amt:
-                            return PriceData("Xbox", title, country, currency, float(amt), None, None, "API", "xbox_api")
+            amt = _xbox_amount(orjson.loads(resp.content))
+            if amt:
+                return amt
     except Exception:
         pass
     
     try:
         url = "https://displaycatalog.mp.microsoft.com/v7.0/products"
         params = {"bigIds": store_id, "market": country, "languages": "en-US", "fieldsTemplate": "Details"}
-        resp = requests.get(url, params=params, headers=headers, timeout=25)
+        resp = await client.get(XBOX_HOST, url, params=params, headers=headers, timeout=25)
         
         if resp.status_code == 200:
-            payload = resp.json()
-            products = payload.get("Products") or payload.get("products")
-            if products and len(products) > 0:
-                p0 = products[0]
-                skus = p0.get("DisplaySkuAvailabilities") or p0.get("displaySkuAvailabilities") or []
-                for sku in skus:
-                    avails = sku.get("Availabilities") or sku.get("availabilities") or []
-                    for av in avails:
-                        omd = av.get("OrderManagementData") or av.get("orderManagementData") or {}
-                        price_obj = omd.get("Price") or omd.get("price") or {}
-                        amt = price_obj.get("MSRP") or price_obj.get("msrp") or price_obj.get("ListPrice") or price_obj.get("listPrice")
-                        if amt:
-                            return PriceData("Xbox", title, country, currency, float(amt), None, None, "API", "xbox_api")
+            amt = _xbox_amount(orjson.loads(resp.content))
+            if amt:
+                return amt
     except Exception:
         pass
     
-    return PriceData("Xbox", title, country, currency, None, None, None, "API", "xbox_api")
+    return None
+
+async def fetch_xbox_price(client: StoreClient, store_id: str, country: str, title: str) -> Optional[PriceData]:
+    """Fetch Xbox price for a specific country"""
+    locale, currency = XBOX_CONFIG.get(country, (None, None))
+    if locale is None:
+        return None
+    return PriceData("Xbox", title, country, currency, await _fetch_xbox_raw(client, store_id, country, locale), None, None, "API", "xbox_api")
 
 # ============================================================================
 # PLAYSTATION PRICE PULLER - v1.5 FIXED MSRP PRIORITY
 # ============================================================================
 
+_PS_PRODUCT_RE = re.compile(r'/product/([^/?#]+)')
+
 def extract_ps_product_id(input_str: str) -> Optional[str]:
     """Extract PlayStation Product ID from URL or return as-is"""
     input_str = input_str.strip()
     if not input_str.startswith("http"):
         return input_str
-    match = re.search(r'/product/([^/?#]+)', input_str)
+    match = _PS_PRODUCT_RE.search(input_str)
     if match:
         return match.group(1)
     return None
@@ -334,14 +500,25 @@ def _num(x: Any) -> Optional[float]:
     except Exception:
         return None
 
-def parse_next_json(html: str) -> Optional[dict]:
+def parse_html(html: str):
+    """Parse a store page once with lxml so every extractor can share the tree"""
+    try:
+        return lxhtml.fromstring(html)
+    except Exception:
+        return None
+
+def _first(tree, path: str):
+    """First element matching an XPath, or None"""
+    found = tree.xpath(path)
+    return found[0] if found else None
+
+def parse_next_json(tree) -> Optional[dict]:
     """Parse PlayStation Next.js JSON"""
-    soup = BeautifulSoup(html, "html.parser")
-    tag = soup.find("script", id="__NEXT_DATA__", type="application/json")
-    if not tag or not tag.string:
+    tag = _first(tree, '//script[@id="__NEXT_DATA__"][@type="application/json"]')
+    if tag is None or not tag.text:
         return None
     try:
-        return json.loads(tag.string)
+        return orjson.loads(tag.text)
     except Exception:
         return None
 
@@ -440,58 +617,68 @@ def from_next_json(next_json: dict) -> Tuple[Optional[str], Optional[str], Optio
     except Exception:
         return None, None, None, "Error", None
 
-def parse_json_ld(html: str) -> Tuple[Optional[str], Optional[float], Optional[str]]:
-    """Parse JSON-LD structured data"""
-    soup = BeautifulSoup(html, "html.parser")
-    scripts = soup.find_all("script", type="application/ld+json")
-    for s in scripts:
+_JSONLD_RE = re.compile(rb'<script[^>]*type=["\']application/ld\+json["\'][^>]*>(.*?)</script>', re.DOTALL | re.IGNORECASE)
+
+def _price_from_ld(data: Any) -> Tuple[Optional[str], Optional[float], Optional[str]]:
+    """Pull (title, price, currency) out of one decoded JSON-LD block"""
+    candidates: List[dict] = []
+    if isinstance(data, dict):
+        candidates = [data]
+    elif isinstance(data, list):
+        candidates = [x for x in data if isinstance(x, dict)]
+    for obj in candidates:
+        t = obj.get("@type")
+        if isinstance(t, list):
+            types = set(str(x).lower() for x in t)
+        else:
+            types = {str(t).lower()} if t else set()
+        if {"product","videogame","offer"} & types or "offers" in obj:
+            title = obj.get("name")
+            offers = obj.get("offers")
+            if isinstance(offers, dict):
+                price = _num(offers.get("price"))
+                currency = offers.get("priceCurrency")
+                if price is not None:
+                    return title, price, currency
+            elif isinstance(offers, list):
+                for off in offers:
+                    if isinstance(off, dict):
+                        price = _num(off.get("price"))
+                        currency = off.get("priceCurrency")
+                        if price is not None:
+                            return title, price, currency
+    return None, None, None
+
+def parse_json_ld(content: bytes, tree) -> Tuple[Optional[str], Optional[float], Optional[str]]:
+    """Parse JSON-LD structured data straight from the page bytes"""
+    blocks = [m.group(1).strip() for m in _JSONLD_RE.finditer(content)]
+    if not blocks:
+        # Unusual markup the regex can't see; look the tags up in the parsed tree
+        blocks = [s.text for s in tree.xpath('//script[@type="application/ld+json"]') if s.text]
+    for block in blocks:
         try:
-            data = json.loads(s.string) if s.string else None
+            data = orjson.loads(block)
         except Exception:
             continue
-        candidates: List[dict] = []
-        if isinstance(data, dict):
-            candidates = [data]
-        elif isinstance(data, list):
-            candidates = [x for x in data if isinstance(x, dict)]
-        for obj in candidates:
-            t = obj.get("@type")
-            if isinstance(t, list):
-                types = set(str(x).lower() for x in t)
-            else:
-                types = {str(t).lower()} if t else set()
-            if {"product","videogame","offer"} & types or "offers" in obj:
-                title = obj.get("name")
-                offers = obj.get("offers")
-                if isinstance(offers, dict):
-                    price = _num(offers.get("price"))
-                    currency = offers.get("priceCurrency")
-                    if price is not None:
-                        return title, price, currency
-                elif isinstance(offers, list):
-                    for off in offers:
-                        if isinstance(off, dict):
-                            price = _num(off.get("price"))
-                            currency = off.get("priceCurrency")
-                            if price is not None:
-                                return title, price, currency
+        title, price, currency = _price_from_ld(data)
+        if price is not None:
+            return title, price, currency
     return None, None, None
 
-def parse_meta_tags(html: str) -> Tuple[Optional[float], Optional[str]]:
+def parse_meta_tags(tree) -> Tuple[Optional[float], Optional[str]]:
     """Parse meta tags for price"""
-    soup = BeautifulSoup(html, "html.parser")
-    meta_amt = soup.find("meta", property="og:price:amount")
-    meta_cur = soup.find("meta", property="og:price:currency")
-    if meta_amt and meta_amt.get("content"):
+    meta_amt = _first(tree, '//meta[@property="og:price:amount"]')
+    meta_cur = _first(tree, '//meta[@property="og:price:currency"]')
+    if meta_amt is not None and meta_amt.get("content"):
         price = _num(meta_amt.get("content"))
-        currency = meta_cur.get("content") if meta_cur and meta_cur.get("content") else None
+        currency = meta_cur.get("content") if meta_cur is not None and meta_cur.get("content") else None
         if price is not None:
             return price, currency
-    ip = soup.find(attrs={"itemprop":"price"})
-    ipcur = soup.find(attrs={"itemprop":"priceCurrency"})
-    if ip and ip.get("content"):
+    ip = _first(tree, '//*[@itemprop="price"]')
+    ipcur = _first(tree, '//*[@itemprop="priceCurrency"]')
+    if ip is not None and ip.get("content"):
         price = _num(ip.get("content"))
-        currency = ipcur.get("content") if ipcur and ipcur.get("content") else None
+        currency = ipcur.get("content") if ipcur is not None and ipcur.get("content") else None
         if price is not None:
             return price, currency
     return None, None
@@ -502,14 +689,12 @@ def choose_currency(parsed: Optional[str], expected: Optional[str]) -> Optional[
         return expected.upper()
     return parsed.upper() if parsed else None
 
-def fetch_ps_price(product_id: str, country: str, title: str) -> Optional[PriceData]:
+async def fetch_ps_price(client: StoreClient, product_id: str, country: str, title: str) -> Optional[PriceData]:
     """Fetch PlayStation price for a specific country with MSRP priority"""
-    if country not in PS_MARKETS:
+    locale, currency = PS_CONFIG.get(country, (None, None))
+    if locale is None:
         return None
     
-    locale = PS_MARKETS[country]
-    currency = PLATFORM_CURRENCIES["PlayStation"].get(country, "USD")
-    
     headers = dict(PS_HEADERS)
     if locale:
         lang = locale.split("-")[0]
@@ -517,13 +702,12 @@ def fetch_ps_price(product_id: str, country: str, title: str) -> Optional[PriceD
     
     try:
         url = f"https://store.playstation.com/{locale}/product/{product_id}"
-        resp = requests.get(url, headers=headers, timeout=30)
+        resp = await client.get(PS_HOST, url, headers=headers, timeout=30)
         
-        if resp.status_code == 200:
-            html = resp.text
-            
+        tree = parse_html(resp.text) if resp.status_code == 200 else None
+        if tree is not None:
             # Try Next.js JSON first
-            nxt = parse_next_json(html)
+            nxt = parse_next_json(tree)
             if nxt:
                 t, _, price, price_type, pcurr = from_next_json(nxt)
                 if price is not None and price > 0:
@@ -531,13 +715,13 @@ def fetch_ps_price(product_id: str, country: str, title: str) -> Optional[PriceD
                     return PriceData("PlayStation", title, country, final_currency, price, None, None, price_type, "next_json")
             
             # Fallback to JSON-LD
-            t2, price2, pcurr2 = parse_json_ld(html)
+            t2, price2, pcurr2 = parse_json_ld(resp.content, tree)
             if price2 is not None and price2 > 0:
                 final_currency = choose_currency(pcurr2, currency)
                 return PriceData("PlayStation", title, country, final_currency, price2, None, None, "Current", "json_ld")
             
             # Fallback to meta tags
-            price3, pcurr3 = parse_meta_tags(html)
+            price3, pcurr3 = parse_meta_tags(tree)
             if price3 is not None and price3 > 0:
                 final_currency = choose_currency(pcurr3, currency)
                 return PriceData("PlayStation", title, country, final_currency, price3, None, None, "Current", "meta_tags")
@@ -551,95 +735,155 @@ def fetch_ps_price(product_id: str, country: str, title: str) -> Optional[PriceD
 # MAIN PULL ORCHESTRATION
 # ============================================================================
 
-def pull_all_prices(steam_games: List[Tuple[str, str]], 
-                   xbox_games: List[Tuple[str, str]], 
-                   ps_games: List[Tuple[str, str]],
-                   max_workers: int = 20) -> Tuple[List[PriceData], List[PriceData], List[PriceData]]:
-    """Pull prices for all games across all platforms and regions"""
+async def _tagged(platform: str, coro):
+    """Await a job's (item id, row) pairs and label them with their platform; a failed job yields none"""
+    try:
+        return platform, await coro
+    except Exception:
+        return platform, []
+
+async def _steam_rows(client: StoreClient, games: Dict[str, List[str]], appids: List[str], cc: str):
+    """Batch-fetch one store cc and fan the prices out to every country and basket title it covers"""
+    prices = await fetch_steam_batch(client, appids, cc)
+    return [(appid, PriceData("Steam", title, country, STEAM_CONFIG[country][1], prices.get(appid), None, None, "API", "steam_api"))
+            for country in STEAM_CC_COUNTRIES[cc] for appid in appids for title in games[appid]]
+
+async def _rows(item_id: str, titles: List[str], coro):
+    """Fetch one (item, market) once and copy the row to every basket title sharing that item"""
+    row = await coro
+    return [(item_id, replace(row, title=title)) for title in titles] if row else []
+
+def _titles_by_id(games: List[Tuple[str, str]]) -> Dict[str, List[str]]:
+    grouped: Dict[str, List[str]] = {}
+    for item_id, title in games:
+        grouped.setdefault(item_id, []).append(title)
+    return grouped
+
+async def _pull_all(client: StoreClient,
+                    cache: PriceCache,
+                    steam_games: List[Tuple[str, str]],
+                    xbox_games: List[Tuple[str, str]],
+                    ps_games: List[Tuple[str, str]]) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Fetch every uncached (platform, item, market) concurrently on the client's event loop"""
+    fresh = cache.fresh()
     
-    steam_results = []
-    xbox_results = []
-    ps_results = []
+    # Column-wise collectors; only the event loop appends to them
+    by_platform = {key: defaultdict(list) for key in ("steam", "xbox", "ps")}
     
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = []
-        
-        # Submit Steam jobs
-        for appid, title in steam_games:
-            for country in STEAM_MARKETS.keys():
-                futures.append((executor.submit(fetch_steam_price, appid, country, title), "steam"))
-        
-        # Submit Xbox jobs
-        for store_id, title in xbox_games:
-            for country in XBOX_MARKETS.keys():
-                futures.append((executor.submit(fetch_xbox_price, store_id, country, title), "xbox"))
-        
-        # Submit PlayStation jobs
-        for product_id, title in ps_games:
-            for country in PS_MARKETS.keys():
-                futures.append((executor.submit(fetch_ps_price, product_id, country, title), "ps"))
-        
-        # Collect results
-        for future_tuple in futures:
-            future, platform = future_tuple
-            try:
-                result = future.result()
-                if result:
-                    if platform == "steam":
-                        steam_results.append(result)
-                    elif platform == "xbox":
-                        xbox_results.append(result)
-                    elif platform == "ps":
-                        ps_results.append(result)
-            except Exception:
-                pass
-    
-    return steam_results, xbox_results, ps_results
-
-def process_results(results: List[PriceData], rates: Dict[str, float]) -> pd.DataFrame:
-    """Process results into DataFrame with USD conversion and variance"""
-    if not results:
+    def collect(key: str, row: PriceData):
+        columns = by_platform[key]
+        for name in PRICE_COLUMNS:
+            columns[name].append(getattr(row, name))
+    
+    def serve(key: str, platform: str, item_id: str, titles: List[str], country: str) -> bool:
+        """Collect a fresh cache hit for every title; False if the market still has to be fetched"""
+        hit = fresh.get((platform, item_id, country))
+        if hit is None:
+            return False
+        currency, price, price_type, source = hit
+        for title in titles:
+            collect(key, PriceData(platform, title, country, currency, price, None, None, price_type, source))
+        return True
+    
+    jobs = []
+    
+    # Steam jobs: one batched call per store cc covers every game not already cached there
+    steam = _titles_by_id(steam_games)
+    for cc, countries in STEAM_CC_COUNTRIES.items():
+        todo = []
+        for appid, titles in steam.items():
+            if all(("Steam", appid, country) in fresh for country in countries):
+                for country in countries:
+                    serve("steam", "Steam", appid, titles, country)
+            else:
+                todo.append(appid)
+        if todo:
+            jobs.append(_tagged("steam", _steam_rows(client, steam, todo, cc)))
+    
+    # Xbox jobs, one per distinct store id and market
+    for store_id, titles in _titles_by_id(xbox_games).items():
+        for country in XBOX_COUNTRIES:
+            if not serve("xbox", "Xbox", store_id, titles, country):
+                jobs.append(_tagged("xbox", _rows(store_id, titles, fetch_xbox_price(client, store_id, country, titles[0]))))
+    
+    # PlayStation jobs, one per distinct product id and market
+    for product_id, titles in _titles_by_id(ps_games).items():
+        for country in PS_COUNTRIES:
+            if not serve("ps", "PlayStation", product_id, titles, country):
+                jobs.append(_tagged("ps", _rows(product_id, titles, fetch_ps_price(client, product_id, country, titles[0]))))
+    
+    # Collect results as they finish rather than in submission order
+    fetched = []
+    for fut in asyncio.as_completed(jobs):
+        key, rows = await fut
+        for item_id, row in rows:
+            collect(key, row)
+            if row.price is not None:
+                fetched.append((row.platform, item_id, row.country, row.currency, row.price, row.price_type, row.source))
+    
+    # Only real prices are cached, so failed fetches are retried next time
+    if fetched:
+        cache.put_many(fetched)
+    
+    steam_df, xbox_df, ps_df = (pd.DataFrame(by_platform[key], columns=PRICE_COLUMNS).astype(CATEGORY_COLUMNS)
+                                for key in ("steam", "xbox", "ps"))
+    return steam_df, xbox_df, ps_df
+
+def pull_all_prices(steam_games: List[Tuple[str, str]], 
+                   xbox_games: List[Tuple[str, str]], 
+                   ps_games: List[Tuple[str, str]]) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Pull prices for all games across all platforms and regions into one frame per platform"""
+    loop, client = get_store_client()
+    return asyncio.run_coroutine_threadsafe(
+        _pull_all(client, get_price_cache(), steam_games, xbox_games, ps_games), loop
+    ).result()
+
+def process_results(df: pd.DataFrame, rates: Dict[str, float]) -> pd.DataFrame:
+    """Process a platform's raw price frame into display columns with USD conversion and variance"""
+    if df.empty:
         return pd.DataFrame()
     
-    # Convert to USD
-    for r in results:
-        r.price_usd = convert_to_usd(r.price, r.currency, rates)
     
-    # Find US baseline
-    us_prices = {}
-    for r in results:
-        if r.country == "US" and r.price_usd:
-            us_prices[r.title] = r.price_usd
+    # Convert to USD in one vectorised divide (unknown currency or non-positive rate -> no USD price)
+    prices = df["price"].to_numpy(dtype=float, na_value=np.nan)
+    rate_vec = np.array([rates.get(c, np.nan) for c in df["currency"]], dtype=float)
+    rate_vec[~(rate_vec > 0)] = np.nan
+    df["price_usd"] = np.round(prices / rate_vec, 2)
+    
+    # Broadcast each title's US price to all of its rows in one groupby pass
+    has_usd = df["price_usd"].notna() & (df["price_usd"] != 0)
+    us_price = df["price_usd"].where(has_usd & (df["country"] == "US")).groupby(df["title"]).transform("last")
     
     # Calculate variance
-    for r in results:
-        if r.price_usd and r.title in us_prices:
-            us_price = us_prices[r.title]
-            if us_price > 0:
-                pct = ((r.price_usd / us_price) - 1) * 100
-                r.diff_vs_us = f"{pct:+.1f}%"
-    
-    # Convert to DataFrame
-    df_data = []
-    for r in results:
-        row = {
-            "Title": r.title,
-            "Country": COUNTRY_NAMES.get(r.country, r.country),
-            "Currency": r.currency,
-            "Local Price": r.price if r.price is not None else None,
-            "USD Price": r.price_usd if r.price_usd is not None else None,
-            "% Diff vs US": r.diff_vs_us if r.diff_vs_us else None
-        }
-        
-        # Add debug columns if enabled
-        if DEBUG_MODE:
-            row["Price Type"] = r.price_type
-            row["Source"] = r.source
-        
-        df_data.append(row)
+    pct = (df["price_usd"] / us_price.where(us_price > 0) - 1) * 100
+    df["diff_vs_us"] = pct.where(has_usd).map(lambda x: f"{x:+.1f}%" if pd.notna(x) else None)
+    
+    # Name the countries per category rather than per row; sorted categories keep the sort alphabetical
+    countries = df["country"].map(lambda c: COUNTRY_NAMES.get(c, c))
     
-    df = pd.DataFrame(df_data)
-    return df.sort_values(["Title", "Country"]).reset_index(drop=True)
+    # Convert to display columns
+    out = pd.DataFrame({
+        "Title": df["title"],
+        "Country": countries.cat.set_categories(sorted(countries.cat.categories)),
+        "Currency": df["currency"],
+        "Local Price": df["price"],
+        "USD Price": df["price_usd"],
+        "% Diff vs US": df["diff_vs_us"],
+    })
+    
+    # Add debug columns if enabled
+    if DEBUG_MODE:
+        out["Price Type"] = df["price_type"]
+        out["Source"] = df["source"]
+    
+    return out.sort_values(["Title", "Country"]).reset_index(drop=True)
+
+@st.cache_data(show_spinner=False)
+def df_to_csv_bytes(df: pd.DataFrame) -> bytes:
+    """Serialise a results table to CSV with pyarrow's writer, once per distinct table"""
+    buf = io.BytesIO()
+    pacsv.write_csv(pa.Table.from_pandas(df, preserve_index=False), buf)
+    return buf.getvalue()
 
 # ============================================================================
 # STREAMLIT UI
@@ -762,31 +1006,31 @@ if st.button("🚀 Pull Prices", type="primary", width='stretch'):
         st.success(f"✅ Price pull complete! Found {len(steam_results)} Steam, {len(xbox_results)} Xbox, {len(ps_results)} PlayStation prices")
         
         # Display Steam results
-        if steam_results:
+        if not steam_results.empty:
             st.markdown("### 🎮 Steam Regional Pricing")
             steam_df = process_results(steam_results, rates)
             st.dataframe(steam_df, width='stretch', height=400)
             st.download_button(
                 "⬇️ Download Steam CSV",
-                steam_df.to_csv(index=False).encode("utf-8"),
+                df_to_csv_bytes(steam_df),
                 "steam_prices.csv",
                 "text/csv"
             )
         
         # Display Xbox results
-        if xbox_results:
+        if not xbox_results.empty:
             st.markdown("### 🎮 Xbox Regional Pricing")
             xbox_df = process_results(xbox_results, rates)
             st.dataframe(xbox_df, width='stretch', height=400)
             st.download_button(
                 "⬇️ Download Xbox CSV",
-                xbox_df.to_csv(index=False).encode("utf-8"),
+                df_to_csv_bytes(xbox_df),
                 "xbox_prices.csv",
                 "text/csv"
             )
         
         # Display PlayStation results
-        if ps_results:
+        if not ps_results.empty:
             st.markdown("### 🎮 PlayStation Regional Pricing")
             ps_df = process_results(ps_results, rates)
             st.dataframe(ps_df, width='stretch', height=400)
@@ -799,7 +1043,7 @@ if st.button("🚀 Pull Prices", type="primary", width='stretch'):
             
             st.download_button(
                 "⬇️ Download PlayStation CSV",
-                ps_df.to_csv(index=False).encode("utf-8"),
+                df_to_csv_bytes(ps_df),
                 "playstation_prices.csv",
                 "text/csv"
             )
\ No newline at end of file
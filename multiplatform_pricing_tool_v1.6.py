@@ -2,16 +2,27 @@
 # FIXED: PlayStation basePrice priority + Enhanced debugging for Call of Duty bundles
 # Download this file and run with: streamlit run multiplatform_pricing_tool_v1.6.py
 
-import json
+import logging
+import os
 import re
 import time
 import random
-from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple, Any
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import asyncio
+import sqlite3
+import tempfile
+import threading
+from collections import namedtuple
+from dataclasses import dataclass, asdict
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Tuple, Any
 
+from aiolimiter import AsyncLimiter
+import httpx
+import orjson
 import requests
-from bs4 import BeautifulSoup
+from lxml import html as lxhtml
+import numpy as np
 import pandas as pd
 import streamlit as st
 
@@ -22,6 +33,13 @@ import streamlit as st
 # Set to True to show debug columns (Price Type, Source)
 DEBUG_MODE = True
 
+# Price extraction logs go to the console at DEBUG level; with DEBUG_MODE off the
+# messages are never formatted
+_log = logging.getLogger("pricing")
+_log.setLevel(logging.DEBUG if DEBUG_MODE else logging.WARNING)
+if not _log.handlers:
+    _log.addHandler(logging.StreamHandler())
+
 st.set_page_config(
     page_title="Unified Game Pricing Tool v1.6",
     page_icon="🎮",
@@ -129,6 +147,28 @@ PLATFORM_CURRENCIES = {
     }
 }
 
+# Countries each platform is pulled for, fixed once at import
+_STEAM_COUNTRIES = tuple(STEAM_MARKETS)
+_XBOX_COUNTRIES = tuple(XBOX_MARKETS)
+_PS_COUNTRIES = tuple(PS_MARKETS)
+
+# Everything the fetchers need about a country in one lookup; a platform's
+# fields are None where it doesn't sell in that country
+CountryInfo = namedtuple("CountryInfo", "name steam_cc xbox_locale ps_locale steam_cur xbox_cur ps_cur")
+
+COUNTRY_INFO: Dict[str, CountryInfo] = {
+    code: CountryInfo(
+        name=COUNTRY_NAMES.get(code, code),
+        steam_cc=STEAM_MARKETS.get(code),
+        xbox_locale=XBOX_MARKETS.get(code),
+        ps_locale=PS_MARKETS.get(code),
+        steam_cur=PLATFORM_CURRENCIES["Steam"].get(code, "USD") if code in STEAM_MARKETS else None,
+        xbox_cur=PLATFORM_CURRENCIES["Xbox"].get(code, "USD") if code in XBOX_MARKETS else None,
+        ps_cur=PLATFORM_CURRENCIES["PlayStation"].get(code, "USD") if code in PS_MARKETS else None,
+    )
+    for code in dict.fromkeys([*COUNTRY_NAMES, *STEAM_MARKETS, *XBOX_MARKETS, *PS_MARKETS])
+}
+
 DEFAULT_HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
     "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8"
@@ -142,11 +182,64 @@ PS_HEADERS = {
     "Connection": "keep-alive",
 }
 
+# ============================================================================
+# HTTP CLIENT
+# ============================================================================
+
+STEAM_HOST = "store.steampowered.com"
+XBOX_HOST = "microsoft.com"  # storeedgefd.dsx.mp + displaycatalog.mp
+PS_HOST = "store.playstation.com"
+
+HOST_CONCURRENCY = {STEAM_HOST: 50, XBOX_HOST: 50, PS_HOST: 25}  # in-flight requests per store host
+HOST_RATE = {STEAM_HOST: 4, XBOX_HOST: 10, PS_HOST: 2}  # requests per second each store tolerates
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+THROTTLE_STATUSES = {429, 503}
+
+class StoreClient:
+    """Pooled keep-alive HTTP/2 client shared by all fetchers, with a concurrency gate and rate limiter per store host"""
+
+    def __init__(self):
+        self.http = httpx.AsyncClient(
+            http2=True,
+            headers=DEFAULT_HEADERS,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=200, max_keepalive_connections=100),
+        )
+        self.gates = {host: asyncio.Semaphore(n) for host, n in HOST_CONCURRENCY.items()}
+        self.limiters = {host: AsyncLimiter(rate, 1) for host, rate in HOST_RATE.items()}
+        # (endpoint, country) -> [successes, attempts]; lives as long as the cached client
+        self.xbox_stats: Dict[Tuple[str, str], List[int]] = {}
+
+    async def get(self, host: str, url: str, retries: int = 3, backoff: float = 0.5, **kwargs) -> httpx.Response:
+        """GET through the host's gate and rate limiter, retrying 429/5xx and transport errors with exponential backoff"""
+        async with self.gates[host]:
+            for attempt in range(retries + 1):
+                delay = backoff * (2 ** attempt)
+                try:
+                    async with self.limiters[host]:
+                        resp = await self.http.get(url, **kwargs)
+                    if resp.status_code not in RETRY_STATUSES or attempt == retries:
+                        return resp
+                    if resp.status_code in THROTTLE_STATUSES:
+                        # The store is pushing back: wait longer, with jitter so retries don't land together
+                        delay = 2 ** attempt + random.random()
+                except httpx.TransportError:
+                    if attempt == retries:
+                        raise
+                await asyncio.sleep(delay)
+
+@st.cache_resource
+def get_store_client() -> Tuple[asyncio.AbstractEventLoop, StoreClient]:
+    """Event loop on a daemon thread plus the StoreClient bound to it, so pooled connections survive reruns"""
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="store-client", daemon=True).start()
+    return loop, StoreClient()
+
 # ============================================================================
 # DATA STRUCTURES
 # ============================================================================
 
-@dataclass
+@dataclass(slots=True)
 class PriceData:
     platform: str
     title: str
@@ -158,33 +251,113 @@ class PriceData:
     price_type: Optional[str] = "API"
     source: Optional[str] = None
 
+# ============================================================================
+# PRICE CACHE
+# ============================================================================
+
+CACHE_PATH = "game_prices.sqlite"
+CACHE_TTL = 21600  # 6h; each entry gets up to another TTL of jitter so they don't all expire together
+
+class PriceCache:
+    """SQLite store of fetched prices keyed on (platform, item id, country), with a per-entry expiry"""
+
+    def __init__(self, path: str = CACHE_PATH):
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS prices ("
+            "platform TEXT, item_id TEXT, country TEXT, currency TEXT, price REAL, "
+            "price_type TEXT, source TEXT, expires_at REAL, "
+            "PRIMARY KEY (platform, item_id, country))"
+        )
+
+    def load(self) -> Dict[Tuple[str, str, str], Tuple[Tuple[str, float, str, str], bool]]:
+        """Every cached price with a flag for whether it's still fresh; stale ones back up failed fetches"""
+        now = time.time()
+        with self.lock:
+            rows = self.db.execute("SELECT * FROM prices").fetchall()
+        return {(platform, item_id, country): ((currency, price, price_type, source), expires_at > now)
+                for platform, item_id, country, currency, price, price_type, source, expires_at in rows}
+
+    def put_many(self, rows: List[Tuple[str, str, str, str, float, str, str]]):
+        now = time.time()
+        with self.lock, self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO prices VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(*row, now + CACHE_TTL + random.uniform(0, CACHE_TTL)) for row in rows],
+            )
+
+@st.cache_resource
+def get_price_cache() -> PriceCache:
+    return PriceCache()
+
 # ============================================================================
 # CURRENCY CONVERSION
 # ============================================================================
 
-def fetch_exchange_rates() -> Dict[str, float]:
-    """Fetch current exchange rates with USD as base"""
-    if "exchange_rates" in st.session_state:
-        cache_time = st.session_state.get("rates_timestamp", 0)
-        if time.time() - cache_time < 7200:
-            return st.session_state["exchange_rates"]
+RATES_PATH = ".rate_cache.json"
+RATES_TTL = 7200  # 2h, plus up to 30 min of jitter so sessions don't all refetch together
+
+def _read_rate_cache() -> Tuple[Optional[Dict[str, float]], float]:
+    """Rates table and expiry time from the on-disk cache, or (None, 0) if there isn't a usable one"""
+    try:
+        with open(RATES_PATH, "rb") as f:
+            cached = orjson.loads(f.read())
+        return cached["rates"], cached["expires_at"]
+    except Exception:
+        return None, 0.0
+
+def _write_rate_cache(rates: Dict[str, float]):
+    expires_at = time.time() + RATES_TTL + random.randint(0, 1800)
+    # Sessions are threads in one process, so each write gets its own temp file;
+    # os.replace is atomic, so readers see either the old table or the new one
+    try:
+        f = tempfile.NamedTemporaryFile(dir=os.path.dirname(os.path.abspath(RATES_PATH)),
+                                        prefix=".rate_cache.", suffix=".tmp", delete=False)
+    except OSError:
+        return
+    try:
+        with f:
+            f.write(orjson.dumps({"rates": rates, "expires_at": expires_at}))
+        os.replace(f.name, RATES_PATH)
+    except OSError:
+        try:
+            os.unlink(f.name)
+        except OSError:
+            pass
+
+def fetch_exchange_rates() -> Mapping[str, float]:
+    """Current USD-based exchange rates, memoized per 2h bucket so reruns don't touch disk or network"""
+    rates, fresh = _fetch_rates_cached(int(time.time() // RATES_TTL))
+    if not fresh:
+        _fetch_rates_cached.cache_clear()  # don't pin a failed fetch or an expired fallback for the whole bucket
+    return rates
+
+@lru_cache(maxsize=4)
+def _fetch_rates_cached(bucket: int) -> Tuple[Mapping[str, float], bool]:
+    """Read-only rates table for one time bucket plus whether it is fresh, shared across sessions and restarts via a disk cache"""
+    cached, expires_at = _read_rate_cache()
+    if cached and time.time() < expires_at:
+        return MappingProxyType(cached), True
     
     rates = {"USD": 1.0}
     try:
         resp = requests.get("https://api.exchangerate.host/latest", 
                           params={"base": "USD"}, timeout=15)
         if resp.status_code == 200:
-            data = resp.json()
+            data = orjson.loads(resp.content)
             if "rates" in data:
                 rates.update({k.upper(): float(v) for k, v in data["rates"].items()})
     except Exception:
         pass
     
-    st.session_state["exchange_rates"] = rates
-    st.session_state["rates_timestamp"] = time.time()
-    return rates
+    # Only a real rates table is cached; on failure fall back to the last good one, even if expired
+    if len(rates) > 1:
+        _write_rate_cache(rates)
+        return MappingProxyType(rates), True
+    return MappingProxyType(cached or rates), False
 
-def convert_to_usd(amount: Optional[float], currency: str, rates: Dict[str, float]) -> Optional[float]:
+def convert_to_usd(amount: Optional[float], currency: str, rates: Mapping[str, float]) -> Optional[float]:
     """Convert amount to USD"""
     if amount is None or currency not in rates:
         return None
@@ -197,116 +370,128 @@ def convert_to_usd(amount: Optional[float], currency: str, rates: Dict[str, floa
 # STEAM PRICE PULLER
 # ============================================================================
 
+_STEAM_APP_RE = re.compile(r'/app/(\d+)')
+
 def extract_steam_appid(input_str: str) -> Optional[str]:
     """Extract Steam AppID from URL or return as-is if numeric"""
     input_str = input_str.strip()
     if input_str.isdigit():
         return input_str
-    match = re.search(r'/app/(\d+)', input_str)
+    match = _STEAM_APP_RE.search(input_str)
     if match:
         return match.group(1)
     return None
 
-def fetch_steam_price(appid: str, country: str, title: str) -> Optional[PriceData]:
-    """Fetch Steam price for a specific country"""
-    if country not in STEAM_MARKETS:
-        return None
-    
-    cc = STEAM_MARKETS[country]
-    currency = PLATFORM_CURRENCIES["Steam"].get(country, "USD")
-    
+async def _steam_price(client: StoreClient, appid: str, cc: str) -> Optional[float]:
+    """Steam list price for one store country code, or None"""
     try:
         url = "https://store.steampowered.com/api/appdetails"
-        params = {"appids": appid, "cc": cc, "l": "en"}
-        resp = requests.get(url, params=params, headers=DEFAULT_HEADERS, timeout=30)
-        data = resp.json().get(str(appid), {})
+        # price_overview trims the payload from tens of KB to a few hundred bytes
+        params = {"appids": appid, "cc": cc, "l": "en", "filters": "price_overview"}
+        resp = await client.get(STEAM_HOST, url, params=params, timeout=30)
+        data = orjson.loads(resp.content).get(str(appid), {})
         
         if not data.get("success"):
-            return PriceData("Steam", title, country, currency, None, None, None, "API", "steam_api")
+            return None
         
-        game_data = data.get("data", {})
-        price_overview = game_data.get("price_overview", {})
+        # Unpriced apps come back with an empty list instead of a dict
+        price_overview = (data.get("data") or {}).get("price_overview", {})
         
         price_cents = price_overview.get("initial") or price_overview.get("final")
         if price_cents and isinstance(price_cents, int) and price_cents > 0:
-            price = round(price_cents / 100.0, 2)
-            return PriceData("Steam", title, country, currency, price, None, None, "API", "steam_api")
+            return round(price_cents / 100.0, 2)
         
     except Exception:
         pass
     
-    return PriceData("Steam", title, country, currency, None, None, None, "API", "steam_api")
+    return None
+
+async def fetch_steam_prices(client: StoreClient, appid: str, title: str, countries: List[str]) -> List[PriceData]:
+    """Fetch one game's Steam prices for many countries, requesting each distinct store cc once"""
+    infos = [(country, info) for country in countries
+             if (info := COUNTRY_INFO.get(country)) is not None and info.steam_cc]
+    ccs = list(dict.fromkeys(info.steam_cc for _, info in infos))
+    prices = dict(zip(ccs, await asyncio.gather(*(_steam_price(client, appid, cc) for cc in ccs))))
+    
+    return [PriceData("Steam", title, country, info.steam_cur, prices[info.steam_cc], None, None, "API", "steam_api")
+            for country, info in infos]
 
 # ============================================================================
 # XBOX PRICE PULLER
 # ============================================================================
 
+_XBOX_RE = re.compile(r'/([9][A-Z0-9]{11})', re.IGNORECASE)
+
 def extract_xbox_store_id(input_str: str) -> Optional[str]:
     """Extract Xbox Store ID from URL or return as-is"""
     input_str = input_str.strip()
     if len(input_str) == 12 and input_str[0] == '9':
         return input_str
-    match = re.search(r'/([9][A-Z0-9]{11})', input_str, re.IGNORECASE)
+    match = _XBOX_RE.search(input_str)
     if match:
         return match.group(1).upper()
     return None
 
-def fetch_xbox_price(store_id: str, country: str, title: str) -> Optional[PriceData]:
+XBOX_ENDPOINTS = (
+    ("storeedge", "https://storeedgefd.dsx.mp.microsoft.com/v9.0/sdk/products"),
+    ("displaycatalog", "https://displaycatalog.mp.microsoft.com/v7.0/products"),
+)
+
+
+def _xbox_endpoint_order(stats: Dict[Tuple[str, str], List[int]], country: str) -> List[Tuple[str, str]]:
+    """Endpoints for a market, historically-successful first (ties keep the default order)."""
+    def rate(endpoint):
+        ok, tried = stats.get((endpoint[0], country), (0, 0))
+        return ok / tried if tried else 0.5
+    return sorted(XBOX_ENDPOINTS, key=rate, reverse=True)
+
+
+def _xbox_amount(payload: dict) -> Optional[float]:
+    products = payload.get("Products") or payload.get("products")
+    if not products:
+        return None
+    p0 = products[0]
+    skus = p0.get("DisplaySkuAvailabilities") or p0.get("displaySkuAvailabilities") or []
+    for sku in skus:
+        avails = sku.get("Availabilities") or sku.get("availabilities") or []
+        for av in avails:
+            omd = av.get("OrderManagementData") or av.get("orderManagementData") or {}
+            price_obj = omd.get("Price") or omd.get("price") or {}
+            amt = price_obj.get("MSRP") or price_obj.get("msrp") or price_obj.get("ListPrice") or price_obj.get("listPrice")
+            if amt:
+                return float(amt)
+    return None
+
+
+async def fetch_xbox_price(client: StoreClient, store_id: str, country: str, title: str) -> Optional[PriceData]:
     """Fetch Xbox price for a specific country"""
-    if country not in XBOX_MARKETS:
+    info = COUNTRY_INFO.get(country)
+    if info is None or info.xbox_locale is None:
         return None
     
-    locale = XBOX_MARKETS[country]
-    currency = PLATFORM_CURRENCIES["Xbox"].get(country, "USD")
+    locale, currency = info.xbox_locale, info.xbox_cur
     
     def _ms_cv():
         return ''.join(random.choices('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789', k=24))
     
     headers = {"MS-CV": _ms_cv(), "Accept": "application/json"}
+    stats = client.xbox_stats
     
-    try:
-        url = "https://storeedgefd.dsx.mp.microsoft.com/v9.0/sdk/products"
-        params = {"bigIds": store_id, "market": country, "locale": locale}
-        resp = requests.get(url, params=params, headers=headers, timeout=25)
-        
-        if resp.status_code == 200:
-            payload = resp.json()
-            products = payload.get("Products") or payload.get("products")
-            if products and len(products) > 0:
-                p0 = products[0]
-                skus = p0.get("DisplaySkuAvailabilities") or p0.get("displaySkuAvailabilities") or []
-                for sku in skus:
-                    avails = sku.get("Availabilities") or sku.get("availabilities") or []
-                    for av in avails:
-                        omd = av.get("OrderManagementData") or av.get("orderManagementData") or {}
-                        price_obj = omd.get("Price") or omd.get("price") or {}
-                        amt = price_obj.get("MSRP") or price_obj.get("msrp") or price_obj.get("ListPrice") or price_obj.get("listPrice")
-                        if amt:
-                            return PriceData("Xbox", title, country, currency, float(amt), None, None, "API", "xbox_api")
-    except Exception:
-        pass
-    
-    try:
-        url = "https://displaycatalog.mp.microsoft.com/v7.0/products"
-        params = {"bigIds": store_id, "market": country, "languages": "en-US", "fieldsTemplate": "Details"}
-        resp = requests.get(url, params=params, headers=headers, timeout=25)
-        
-        if resp.status_code == 200:
-            payload = resp.json()
-            products = payload.get("Products") or payload.get("products")
-            if products and len(products) > 0:
-                p0 = products[0]
-                skus = p0.get("DisplaySkuAvailabilities") or p0.get("displaySkuAvailabilities") or []
-                for sku in skus:
-                    avails = sku.get("Availabilities") or sku.get("availabilities") or []
-                    for av in avails:
-                        omd = av.get("OrderManagementData") or av.get("orderManagementData") or {}
-                        price_obj = omd.get("Price") or omd.get("price") or {}
-                        amt = price_obj.get("MSRP") or price_obj.get("msrp") or price_obj.get("ListPrice") or price_obj.get("listPrice")
-                        if amt:
-                            return PriceData("Xbox", title, country, currency, float(amt), None, None, "API", "xbox_api")
-    except Exception:
-        pass
+    for name, url in _xbox_endpoint_order(stats, country):
+        if name == "storeedge":
+            params = {"bigIds": store_id, "market": country, "locale": locale}
+        else:
+            params = {"bigIds": store_id, "market": country, "languages": "en-US", "fieldsTemplate": "Details"}
+        counts = stats.setdefault((name, country), [0, 0])
+        counts[1] += 1
+        try:
+            resp = await client.get(XBOX_HOST, url, params=params, headers=headers, timeout=25)
+            amt = _xbox_amount(orjson.loads(resp.content)) if resp.status_code == 200 else None
+        except Exception:
+            amt = None
+        if amt:
+            counts[0] += 1
+            return PriceData("Xbox", title, country, currency, amt, None, None, "API", "xbox_api")
     
     return PriceData("Xbox", title, country, currency, None, None, None, "API", "xbox_api")
 
@@ -314,37 +499,75 @@ def fetch_xbox_price(store_id: str, country: str, title: str) -> Optional[PriceD
 # PLAYSTATION PRICE PULLER - v1.6 WITH ENHANCED basePrice PRIORITY
 # ============================================================================
 
+_PSN_RE = re.compile(r'/product/([^/?#]+)')
+
 def extract_ps_product_id(input_str: str) -> Optional[str]:
     """Extract PlayStation Product ID from URL or return as-is"""
     input_str = input_str.strip()
     if not input_str.startswith("http"):
         return input_str
-    match = re.search(r'/product/([^/?#]+)', input_str)
+    match = _PSN_RE.search(input_str)
     if match:
         return match.group(1)
     return None
 
 def _num(x: Any) -> Optional[float]:
     """Convert to number safely"""
+    if x is None or isinstance(x, bool):
+        return None
+    if isinstance(x, (int, float)):
+        return float(x)
     try:
-        if x is None:
-            return None
-        s = str(x).strip().replace(",", "")
-        return float(s)
+        return float(str(x).strip().replace(",", ""))
     except Exception:
         return None
 
-def parse_next_json(html: str) -> Optional[dict]:
-    """Parse PlayStation Next.js JSON"""
-    soup = BeautifulSoup(html, "html.parser")
-    tag = soup.find("script", id="__NEXT_DATA__", type="application/json")
-    if not tag or not tag.string:
+def parse_html(content: bytes):
+    """Parse a store page once with lxml so every extractor can share the tree"""
+    try:
+        return lxhtml.fromstring(content)
+    except Exception:
+        return None
+
+def _first(tree, path: str):
+    """First element matching an XPath, or None"""
+    found = tree.xpath(path)
+    return found[0] if found else None
+
+_NEXT_RE = re.compile(rb'<script id="__NEXT_DATA__"[^>]*>(.*?)</script>', re.S)
+
+def parse_next_json(content: bytes) -> Optional[dict]:
+    """Parse PlayStation Next.js JSON straight from the response bytes"""
+    m = _NEXT_RE.search(content)
+    if not m:
         return None
     try:
-        return json.loads(tag.string)
+        return orjson.loads(m.group(1))
     except Exception:
         return None
 
+# PlayStation price fields in priority order, with the price type each one reports
+_PRICE_KEYS = (
+    ("basePrice", "MSRP"),
+    ("finalPrice", "Current"),
+    ("discountedPrice", "Sale Price"),
+    ("current", "Current"),
+    ("value", "Current"),
+)
+
+def _debug_price_choice(debug_prefix: str, key: str, price: float, price_dict: dict):
+    """Log which field extract_price_with_type settled on"""
+    if key == "basePrice":
+        disc = _num(price_dict.get("discountedPrice"))
+        if disc and 0 < disc < price:
+            _log.debug("%s ✓ Using basePrice %s (on sale, ignoring disc %s)", debug_prefix, price, disc)
+        else:
+            _log.debug("%s ✓ Using basePrice %s", debug_prefix, price)
+    elif key == "finalPrice":
+        _log.debug("%s Using finalPrice %s", debug_prefix, price)
+    elif key == "discountedPrice":
+        _log.debug("%s ⚠ Using discountedPrice %s (basePrice unavailable)", debug_prefix, price)
+
 def extract_price_with_type(price_dict: dict, debug_prefix: str = "") -> Tuple[Optional[float], str]:
     """
     Extract price from PlayStation price object with ENHANCED basePrice priority
@@ -356,45 +579,20 @@ def extract_price_with_type(price_dict: dict, debug_prefix: str = "") -> Tuple[O
     if not isinstance(price_dict, dict):
         return None, "Unknown"
     
-    # Extract ALL price fields for debugging
-    base = _num(price_dict.get("basePrice"))
-    disc = _num(price_dict.get("discountedPrice"))
-    final = _num(price_dict.get("finalPrice"))
-    current = _num(price_dict.get("current"))
-    value = _num(price_dict.get("value"))
-    
-    if DEBUG_MODE and debug_prefix:
-        print(f"{debug_prefix} Price fields: base={base}, disc={disc}, final={final}, current={current}, value={value}")
-    
-    # PRIORITY 1: basePrice (MSRP) - THE MOST IMPORTANT
-    # This is the fix: always use basePrice when it exists
-    if base and base > 0:
-        # Check if item is on sale (discounted < base)
-        if disc and disc > 0 and disc < base:
-            if DEBUG_MODE and debug_prefix:
-                print(f"{debug_prefix} ✓ Using basePrice {base} (on sale, ignoring disc {disc})")
-            return base, "MSRP"
-        if DEBUG_MODE and debug_prefix:
-            print(f"{debug_prefix} ✓ Using basePrice {base}")
-        return base, "MSRP"
-    
-    # PRIORITY 2: finalPrice
-    if final and final > 0:
-        if DEBUG_MODE and debug_prefix:
-            print(f"{debug_prefix} Using finalPrice {final}")
-        return final, "Current"
-    
-    # PRIORITY 3: discountedPrice (ONLY if basePrice missing)
-    if disc and disc > 0:
-        if DEBUG_MODE and debug_prefix:
-            print(f"{debug_prefix} ⚠ Using discountedPrice {disc} (basePrice unavailable)")
-        return disc, "Sale Price"
-    
-    # PRIORITY 4: Other fields
-    if current and current > 0:
-        return current, "Current"
-    if value and value > 0:
-        return value, "Current"
+    debug = debug_prefix and _log.isEnabledFor(logging.DEBUG)
+    if debug:
+        base, final, disc, current, value = (_num(price_dict.get(k)) for k, _ in _PRICE_KEYS)
+        _log.debug("%s Price fields: base=%s, disc=%s, final=%s, current=%s, value=%s",
+                   debug_prefix, base, disc, final, current, value)
+    
+    # basePrice (MSRP) wins whenever it exists, even if the item is on sale;
+    # discountedPrice is only used when there's no basePrice or finalPrice
+    for key, price_type in _PRICE_KEYS:
+        price = _num(price_dict.get(key))
+        if price and price > 0:
+            if debug:
+                _debug_price_choice(debug_prefix, key, price, price_dict)
+            return price, price_type
     
     return None, "Unknown"
 
@@ -408,7 +606,7 @@ def from_next_json(next_json: dict, product_id: str = "") -> Tuple[Optional[str]
         title = product.get("name") or product.get("title") or page_props.get("title")
         pid = product.get("id") or product.get("productId") or product.get("slug") or page_props.get("productId")
 
-        debug_prefix = f"[PSN {product_id}]" if DEBUG_MODE else ""
+        debug_prefix = f"[PSN {product_id}]" if _log.isEnabledFor(logging.DEBUG) else ""
 
         # Location 1: Direct product.price
         p = product.get("price") if isinstance(product, dict) else None
@@ -449,17 +647,16 @@ def from_next_json(next_json: dict, product_id: str = "") -> Tuple[Optional[str]
 
         return title, pid, None, "Unknown", None
     except Exception as e:
-        if DEBUG_MODE:
-            print(f"[PSN] from_next_json error: {e}")
+        _log.debug("[PSN] from_next_json error: %s", e)
         return None, None, None, "Error", None
 
-def parse_json_ld(html: str) -> Tuple[Optional[str], Optional[float], Optional[str]]:
-    """Parse JSON-LD structured data"""
-    soup = BeautifulSoup(html, "html.parser")
-    scripts = soup.find_all("script", type="application/ld+json")
-    for s in scripts:
+_LD_RE = re.compile(rb'<script[^>]*type=["\']application/ld\+json["\'][^>]*>(.*?)</script>', re.S | re.I)
+
+def parse_json_ld(content: bytes) -> Tuple[Optional[str], Optional[float], Optional[str]]:
+    """Parse JSON-LD structured data straight from the page bytes, stopping at the first priced offer"""
+    for m in _LD_RE.finditer(content):
         try:
-            data = json.loads(s.string) if s.string else None
+            data = orjson.loads(m.group(1))
         except Exception:
             continue
         candidates: List[dict] = []
@@ -490,21 +687,20 @@ def parse_json_ld(html: str) -> Tuple[Optional[str], Optional[float], Optional[s
                                 return title, price, currency
     return None, None, None
 
-def parse_meta_tags(html: str) -> Tuple[Optional[float], Optional[str]]:
+def parse_meta_tags(tree) -> Tuple[Optional[float], Optional[str]]:
     """Parse meta tags for price"""
-    soup = BeautifulSoup(html, "html.parser")
-    meta_amt = soup.find("meta", property="og:price:amount")
-    meta_cur = soup.find("meta", property="og:price:currency")
-    if meta_amt and meta_amt.get("content"):
+    meta_amt = _first(tree, '//meta[@property="og:price:amount"]')
+    meta_cur = _first(tree, '//meta[@property="og:price:currency"]')
+    if meta_amt is not None and meta_amt.get("content"):
         price = _num(meta_amt.get("content"))
-        currency = meta_cur.get("content") if meta_cur and meta_cur.get("content") else None
+        currency = meta_cur.get("content") if meta_cur is not None and meta_cur.get("content") else None
         if price is not None:
             return price, currency
-    ip = soup.find(attrs={"itemprop":"price"})
-    ipcur = soup.find(attrs={"itemprop":"priceCurrency"})
-    if ip and ip.get("content"):
+    ip = _first(tree, '//*[@itemprop="price"]')
+    ipcur = _first(tree, '//*[@itemprop="priceCurrency"]')
+    if ip is not None and ip.get("content"):
         price = _num(ip.get("content"))
-        currency = ipcur.get("content") if ipcur and ipcur.get("content") else None
+        currency = ipcur.get("content") if ipcur is not None and ipcur.get("content") else None
         if price is not None:
             return price, currency
     return None, None
@@ -515,13 +711,13 @@ def choose_currency(parsed: Optional[str], expected: Optional[str]) -> Optional[
         return expected.upper()
     return parsed.upper() if parsed else None
 
-def fetch_ps_price(product_id: str, country: str, title: str) -> Optional[PriceData]:
+async def fetch_ps_price(client: StoreClient, product_id: str, country: str, title: str) -> Optional[PriceData]:
     """Fetch PlayStation price with enhanced MSRP priority and debugging"""
-    if country not in PS_MARKETS:
+    info = COUNTRY_INFO.get(country)
+    if info is None or info.ps_locale is None:
         return None
     
-    locale = PS_MARKETS[country]
-    currency = PLATFORM_CURRENCIES["PlayStation"].get(country, "USD")
+    locale, currency = info.ps_locale, info.ps_cur
     
     headers = dict(PS_HEADERS)
     if locale:
@@ -530,39 +726,34 @@ def fetch_ps_price(product_id: str, country: str, title: str) -> Optional[PriceD
     
     try:
         url = f"https://store.playstation.com/{locale}/product/{product_id}"
-        resp = requests.get(url, headers=headers, timeout=30)
+        resp = await client.get(PS_HOST, url, headers=headers, timeout=30)
         
         if resp.status_code == 200:
-            html = resp.text
-            
             # Try Next.js JSON first
-            nxt = parse_next_json(html)
+            nxt = parse_next_json(resp.content)
             if nxt:
                 t, _, price, price_type, pcurr = from_next_json(nxt, product_id)
                 if price is not None and price > 0:
                     final_currency = choose_currency(pcurr, currency)
-                    if DEBUG_MODE:
-                        print(f"[PSN {product_id} {country}] SUCCESS: {price} {final_currency} ({price_type})")
+                    _log.debug("[PSN %s %s] SUCCESS: %s %s (%s)", product_id, country, price, final_currency, price_type)
                     return PriceData("PlayStation", title, country, final_currency, price, None, None, price_type, "next_json")
             
             # Fallback to JSON-LD
-            t2, price2, pcurr2 = parse_json_ld(html)
+            t2, price2, pcurr2 = parse_json_ld(resp.content)
             if price2 is not None and price2 > 0:
                 final_currency = choose_currency(pcurr2, currency)
                 return PriceData("PlayStation", title, country, final_currency, price2, None, None, "Current", "json_ld")
             
-            # Fallback to meta tags
-            price3, pcurr3 = parse_meta_tags(html)
+            # Fallback to meta tags; only this path needs the parsed tree
+            price3, pcurr3 = parse_meta_tags(parse_html(resp.content))
             if price3 is not None and price3 > 0:
                 final_currency = choose_currency(pcurr3, currency)
                 return PriceData("PlayStation", title, country, final_currency, price3, None, None, "Current", "meta_tags")
         
-        if DEBUG_MODE:
-            print(f"[PSN {product_id} {country}] FAILED: HTTP {resp.status_code}")
+        _log.debug("[PSN %s %s] FAILED: HTTP %s", product_id, country, resp.status_code)
                 
     except Exception as e:
-        if DEBUG_MODE:
-            print(f"[PSN {product_id} {country}] ERROR: {e}")
+        _log.debug("[PSN %s %s] ERROR: %s", product_id, country, e)
     
     return PriceData("PlayStation", title, country, currency, None, None, None, "N/A", None)
 
@@ -570,95 +761,117 @@ def fetch_ps_price(product_id: str, country: str, title: str) -> Optional[PriceD
 # MAIN PULL ORCHESTRATION
 # ============================================================================
 
+async def _tagged(key: str, item_id: str, stale: Dict[str, Optional[tuple]], coro):
+    """Await a fetch and label its outcome with its platform, item id and stale cache entries"""
+    try:
+        return key, item_id, stale, await coro
+    except Exception:
+        return key, item_id, stale, None
+
+async def _pull_all(client: StoreClient,
+                    cache: PriceCache,
+                    steam_games: List[Tuple[str, str]],
+                    xbox_games: List[Tuple[str, str]],
+                    ps_games: List[Tuple[str, str]]) -> Tuple[List[PriceData], List[PriceData], List[PriceData]]:
+    """Run every uncached (game, country) fetch concurrently on the client's event loop"""
+    cached = cache.load()
+    by_platform = {"steam": [], "xbox": [], "ps": []}
+    jobs = []
+    
+    def misses(key: str, platform: str, item_id: str, title: str, countries) -> Dict[str, Optional[tuple]]:
+        """Serve fresh cache hits directly; return the countries still to fetch with any stale entry"""
+        todo = {}
+        for country in countries:
+            entry = cached.get((platform, item_id, country))
+            if entry and entry[1]:
+                currency, price, price_type, source = entry[0]
+                by_platform[key].append(PriceData(platform, title, country, currency, price, None, None, price_type, source))
+            else:
+                todo[country] = entry
+        return todo
+    
+    # Steam jobs: all of a game's countries go out as one batch so shared store ccs are fetched once
+    for appid, title in steam_games:
+        todo = misses("steam", "Steam", appid, title, _STEAM_COUNTRIES)
+        if todo:
+            jobs.append(_tagged("steam", appid, todo, fetch_steam_prices(client, appid, title, list(todo))))
+    
+    # Xbox jobs
+    for store_id, title in xbox_games:
+        for country, stale in misses("xbox", "Xbox", store_id, title, _XBOX_COUNTRIES).items():
+            jobs.append(_tagged("xbox", store_id, {country: stale}, fetch_xbox_price(client, store_id, country, title)))
+    
+    # PlayStation jobs
+    for product_id, title in ps_games:
+        for country, stale in misses("ps", "PlayStation", product_id, title, _PS_COUNTRIES).items():
+            jobs.append(_tagged("ps", product_id, {country: stale}, fetch_ps_price(client, product_id, country, title)))
+    
+    # Handle each result as soon as it lands instead of waiting on the slowest fetch
+    fetched = []
+    for fut in asyncio.as_completed(jobs):
+        key, item_id, stale, result = await fut
+        if not result:
+            continue
+        for r in result if isinstance(result, list) else [result]:
+            if r.price is not None:
+                fetched.append((r.platform, item_id, r.country, r.currency, r.price, r.price_type, r.source))
+            elif stale.get(r.country):
+                # Serve the last good price rather than a blank when the store errors out
+                r.currency, r.price, r.price_type, r.source = stale[r.country][0]
+            by_platform[key].append(r)
+    
+    # Only real prices are cached, so failed fetches are retried next time
+    if fetched:
+        cache.put_many(fetched)
+    
+    return by_platform["steam"], by_platform["xbox"], by_platform["ps"]
+
 def pull_all_prices(steam_games: List[Tuple[str, str]], 
                    xbox_games: List[Tuple[str, str]], 
-                   ps_games: List[Tuple[str, str]],
-                   max_workers: int = 20) -> Tuple[List[PriceData], List[PriceData], List[PriceData]]:
+                   ps_games: List[Tuple[str, str]]) -> Tuple[List[PriceData], List[PriceData], List[PriceData]]:
     """Pull prices for all games across all platforms and regions"""
-    
-    steam_results = []
-    xbox_results = []
-    ps_results = []
-    
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = []
-        
-        # Submit Steam jobs
-        for appid, title in steam_games:
-            for country in STEAM_MARKETS.keys():
-                futures.append((executor.submit(fetch_steam_price, appid, country, title), "steam"))
-        
-        # Submit Xbox jobs
-        for store_id, title in xbox_games:
-            for country in XBOX_MARKETS.keys():
-                futures.append((executor.submit(fetch_xbox_price, store_id, country, title), "xbox"))
-        
-        # Submit PlayStation jobs
-        for product_id, title in ps_games:
-            for country in PS_MARKETS.keys():
-                futures.append((executor.submit(fetch_ps_price, product_id, country, title), "ps"))
-        
-        # Collect results
-        for future_tuple in futures:
-            future, platform = future_tuple
-            try:
-                result = future.result()
-                if result:
-                    if platform == "steam":
-                        steam_results.append(result)
-                    elif platform == "xbox":
-                        xbox_results.append(result)
-                    elif platform == "ps":
-                        ps_results.append(result)
-            except Exception:
-                pass
-    
-    return steam_results, xbox_results, ps_results
-
-def process_results(results: List[PriceData], rates: Dict[str, float]) -> pd.DataFrame:
+    loop, client = get_store_client()
+    return asyncio.run_coroutine_threadsafe(
+        _pull_all(client, get_price_cache(), steam_games, xbox_games, ps_games), loop
+    ).result()
+
+def process_results(results: List[PriceData], rates: Mapping[str, float]) -> pd.DataFrame:
     """Process results into DataFrame with USD conversion and variance"""
     if not results:
         return pd.DataFrame()
     
-    # Convert to USD
-    for r in results:
-        r.price_usd = convert_to_usd(r.price, r.currency, rates)
+    df = pd.DataFrame([asdict(r) for r in results])
+    
+    # Convert to USD in one vectorised divide (unknown currency or non-positive rate -> no USD price)
+    prices = df["price"].to_numpy(dtype=float, na_value=np.nan)
+    rate_vec = np.array([rates.get(c, np.nan) for c in df["currency"]], dtype=float)
+    rate_vec[~(rate_vec > 0)] = np.nan
+    df["price_usd"] = np.round(prices / rate_vec, 2)
     
-    # Find US baseline
-    us_prices = {}
-    for r in results:
-        if r.country == "US" and r.price_usd:
-            us_prices[r.title] = r.price_usd
+    # Broadcast each title's US price to all of its rows in one groupby pass
+    has_usd = df["price_usd"].notna() & (df["price_usd"] != 0)
+    us_price = df["price_usd"].where(has_usd & (df["country"] == "US")).groupby(df["title"]).transform("last")
     
     # Calculate variance
-    for r in results:
-        if r.price_usd and r.title in us_prices:
-            us_price = us_prices[r.title]
-            if us_price > 0:
-                pct = ((r.price_usd / us_price) - 1) * 100
-                r.diff_vs_us = f"{pct:+.1f}%"
-    
-    # Convert to DataFrame
-    df_data = []
-    for r in results:
-        row = {
-            "Title": r.title,
-            "Country": COUNTRY_NAMES.get(r.country, r.country),
-            "Currency": r.currency,
-            "Local Price": r.price if r.price is not None else None,
-            "USD Price": r.price_usd if r.price_usd is not None else None,
-            "% Diff vs US": r.diff_vs_us if r.diff_vs_us else None
-        }
-        
-        # Add debug columns if enabled
-        if DEBUG_MODE:
-            row["Price Type"] = r.price_type
-            row["Source"] = r.source
-        
-        df_data.append(row)
+    pct = (df["price_usd"] / us_price.where(us_price > 0) - 1) * 100
+    df["diff_vs_us"] = pct.where(has_usd).map(lambda x: f"{x:+.1f}%" if pd.notna(x) else None)
+    
+    # Convert to display columns
+    out = pd.DataFrame({
+        "Title": df["title"],
+        "Country": df["country"].map(COUNTRY_NAMES).fillna(df["country"]),
+        "Currency": df["currency"],
+        "Local Price": df["price"],
+        "USD Price": df["price_usd"],
+        "% Diff vs US": df["diff_vs_us"],
+    })
+    
+    # Add debug columns if enabled
+    if DEBUG_MODE:
+        out["Price Type"] = df["price_type"]
+        out["Source"] = df["source"]
     
-    df = pd.DataFrame(df_data)
-    return df.sort_values(["Title", "Country"]).reset_index(drop=True)
+    return out.sort_values(["Title", "Country"]).reset_index(drop=True)
 
 # ============================================================================
 # STREAMLIT UI
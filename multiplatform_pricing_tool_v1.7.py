@@ -2,16 +2,18 @@
 # MAJOR FIX: Robust basePrice extraction + Better JSON-LD parsing + Debug column shows parse method
 # Fixes: Australia locale, sale price issues, missing Call of Duty prices
 
-import json
 import re
 import time
 import random
-from dataclasses import dataclass
+import asyncio
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, replace
 from typing import Dict, List, Optional, Tuple, Any
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
+import httpx
+import orjson
 import requests
-from bs4 import BeautifulSoup
 import pandas as pd
 import streamlit as st
 
@@ -141,6 +143,80 @@ PS_HEADERS = {
     "Connection": "keep-alive",
 }
 
+def _accept_language(locale: str) -> str:
+    lang = locale.split("-")[0]
+    return f"{lang}-{locale.split('-')[-1].upper()},{lang};q=0.8"
+
+# Per-country request headers and product URL templates, built once at import
+_PS_HEADERS_BY_COUNTRY: Dict[str, Dict[str, str]] = {
+    c: {**PS_HEADERS, "Accept-Language": _accept_language(loc)} if loc else dict(PS_HEADERS)
+    for c, loc in PS_MARKETS.items()
+}
+_PS_URL_BY_COUNTRY: Dict[str, str] = {
+    c: f"https://store.playstation.com/{loc}/product/{{pid}}" for c, loc in PS_MARKETS.items()
+}
+
+# ============================================================================
+# HTTP CLIENT
+# ============================================================================
+
+STEAM_HOST = "store.steampowered.com"
+XBOX_HOST = "microsoft.com"  # storeedgefd.dsx.mp + displaycatalog.mp
+PS_HOST = "store.playstation.com"
+
+HOST_CONCURRENCY = 32  # in-flight requests per store host, to stay clear of their rate limits
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+CACHE_TTL = 3600  # seconds a parsed PSN page is reused before revalidating it
+PAGE_CACHE_SIZE = 4096  # PSN pages remembered for revalidation; least recently used go first
+
+class StoreClient:
+    """Pooled HTTP/2 client shared by every fetcher across pulls, with a concurrency gate per store host"""
+
+    def __init__(self):
+        self.http = httpx.AsyncClient(
+            http2=True,
+            headers=DEFAULT_HEADERS,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=200, max_keepalive_connections=50),
+        )
+        self.gates = {host: asyncio.Semaphore(HOST_CONCURRENCY) for host in (STEAM_HOST, XBOX_HOST, PS_HOST)}
+        # PSN page URL -> (ETag, Last-Modified, checked at, parsed row) for conditional re-fetches.
+        # Only touched from the client's event loop, so no lock is needed.
+        self.pages: "OrderedDict[str, Tuple[Optional[str], Optional[str], float, PriceData]]" = OrderedDict()
+
+    def page(self, url: str):
+        """Cached entry for a PSN page, marking it recently used"""
+        entry = self.pages.get(url)
+        if entry is not None:
+            self.pages.move_to_end(url)
+        return entry
+
+    def store_page(self, url: str, entry: Tuple[Optional[str], Optional[str], float, "PriceData"]):
+        self.pages[url] = entry
+        self.pages.move_to_end(url)
+        while len(self.pages) > PAGE_CACHE_SIZE:
+            self.pages.popitem(last=False)
+
+    async def get(self, host: str, url: str, retries: int = 2, backoff: float = 0.3, **kwargs) -> httpx.Response:
+        """GET through the host's gate, retrying 429/5xx and transport errors with exponential backoff"""
+        async with self.gates[host]:
+            for attempt in range(retries + 1):
+                try:
+                    resp = await self.http.get(url, **kwargs)
+                    if resp.status_code not in RETRY_STATUSES or attempt == retries:
+                        return resp
+                except httpx.TransportError:
+                    if attempt == retries:
+                        raise
+                await asyncio.sleep(backoff * (2 ** attempt))
+
+@st.cache_resource(show_spinner=False)
+def get_store_client() -> Tuple[asyncio.AbstractEventLoop, StoreClient]:
+    """Event loop on a daemon thread plus the StoreClient bound to it, so pooled connections survive reruns"""
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="store-client", daemon=True).start()
+    return loop, StoreClient()
+
 # ============================================================================
 # DATA STRUCTURES
 # ============================================================================
@@ -197,17 +273,19 @@ def convert_to_usd(amount: Optional[float], currency: str, rates: Dict[str, floa
 # STEAM PRICE PULLER
 # ============================================================================
 
+_STEAM_APPID_RE = re.compile(r'/app/(\d+)')
+
 def extract_steam_appid(input_str: str) -> Optional[str]:
     """Extract Steam AppID from URL or return as-is if numeric"""
     input_str = input_str.strip()
     if input_str.isdigit():
         return input_str
-    match = re.search(r'/app/(\d+)', input_str)
+    match = _STEAM_APPID_RE.search(input_str)
     if match:
         return match.group(1)
     return None
 
-def fetch_steam_price(appid: str, country: str, title: str) -> Optional[PriceData]:
+async def fetch_steam_price(client: StoreClient, appid: str, country: str, title: str) -> Optional[PriceData]:
     """Fetch Steam price for a specific country"""
     if country not in STEAM_MARKETS:
         return None
@@ -218,7 +296,7 @@ def fetch_steam_price(appid: str, country: str, title: str) -> Optional[PriceDat
     try:
         url = "https://store.steampowered.com/api/appdetails"
         params = {"appids": appid, "cc": cc, "l": "en"}
-        resp = requests.get(url, params=params, headers=DEFAULT_HEADERS, timeout=30)
+        resp = await client.get(STEAM_HOST, url, params=params, headers=DEFAULT_HEADERS, timeout=30)
         data = resp.json().get(str(appid), {})
         
         if not data.get("success"):
@@ -241,17 +319,19 @@ def fetch_steam_price(appid: str, country: str, title: str) -> Optional[PriceDat
 # XBOX PRICE PULLER
 # ============================================================================
 
+_XBOX_STORE_RE = re.compile(r'/([9][A-Z0-9]{11})', re.IGNORECASE)
+
 def extract_xbox_store_id(input_str: str) -> Optional[str]:
     """Extract Xbox Store ID from URL or return as-is"""
     input_str = input_str.strip()
     if len(input_str) == 12 and input_str[0] == '9':
         return input_str
-    match = re.search(r'/([9][A-Z0-9]{11})', input_str, re.IGNORECASE)
+    match = _XBOX_STORE_RE.search(input_str)
     if match:
         return match.group(1).upper()
     return None
 
-def fetch_xbox_price(store_id: str, country: str, title: str) -> Optional[PriceData]:
+async def fetch_xbox_price(client: StoreClient, store_id: str, country: str, title: str) -> Optional[PriceData]:
     """Fetch Xbox price for a specific country"""
     if country not in XBOX_MARKETS:
         return None
@@ -267,7 +347,7 @@ def fetch_xbox_price(store_id: str, country: str, title: str) -> Optional[PriceD
     try:
         url = "https://storeedgefd.dsx.mp.microsoft.com/v9.0/sdk/products"
         params = {"bigIds": store_id, "market": country, "locale": locale}
-        resp = requests.get(url, params=params, headers=headers, timeout=25)
+        resp = await client.get(XBOX_HOST, url, params=params, headers=headers, timeout=25)
         
         if resp.status_code == 200:
             payload = resp.json()
@@ -289,7 +369,7 @@ def fetch_xbox_price(store_id: str, country: str, title: str) -> Optional[PriceD
     try:
         url = "https://displaycatalog.mp.microsoft.com/v7.0/products"
         params = {"bigIds": store_id, "market": country, "languages": "en-US", "fieldsTemplate": "Details"}
-        resp = requests.get(url, params=params, headers=headers, timeout=25)
+        resp = await client.get(XBOX_HOST, url, params=params, headers=headers, timeout=25)
         
         if resp.status_code == 200:
             payload = resp.json()
@@ -314,60 +394,116 @@ def fetch_xbox_price(store_id: str, country: str, title: str) -> Optional[PriceD
 # PLAYSTATION PRICE PULLER - v1.7 ROBUST PARSING
 # ============================================================================
 
+_PS_PRODUCT_RE = re.compile(r'/product/([^/?#]+)')
+
 def extract_ps_product_id(input_str: str) -> Optional[str]:
     """Extract PlayStation Product ID from URL or return as-is"""
     input_str = input_str.strip()
     if not input_str.startswith("http"):
         return input_str
-    match = re.search(r'/product/([^/?#]+)', input_str)
+    match = _PS_PRODUCT_RE.search(input_str)
     if match:
         return match.group(1)
     return None
 
 def _num(x: Any) -> Optional[float]:
     """Convert to number safely"""
+    if x is None or isinstance(x, bool):
+        return None
     try:
-        if x is None:
-            return None
-        s = str(x).strip().replace(",", "")
-        return float(s)
+        # PSN JSON mostly carries real numbers already
+        if isinstance(x, (int, float)):
+            return float(x)
+        if isinstance(x, str):
+            return float(x.strip().replace(",", ""))
+        return float(str(x).strip().replace(",", ""))
     except Exception:
         return None
 
-def parse_next_json(html: str) -> Optional[dict]:
-    """Parse PlayStation Next.js JSON with multiple fallback strategies"""
-    soup = BeautifulSoup(html, "html.parser")
+# One scan over the page: every <script> with its body, plus any tag carrying property= or itemprop=
+_PAGE_TAG_RE = re.compile(
+    r'<script\b([^>]*)>(.*?)</script>|<([a-z][a-z0-9]*)\b([^>]*\s(?:property|itemprop)\s*=[^>]*)>',
+    re.DOTALL | re.IGNORECASE,
+)
+# Attribute values may be double-quoted, single-quoted or bare, as HTML allows
+_ATTR_RE = re.compile(
+    r'\s(id|type|property|itemprop|content)\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s"\'>]+))',
+    re.IGNORECASE,
+)
+_NEXT_JSON_BLOB_RE = re.compile(r'({.*})', re.DOTALL)
+_OG_PRICE_KEYS = {"og:price:amount", "og:price:currency"}
+_ITEMPROP_PRICE_KEYS = {"price", "pricecurrency"}
+
+def _attrs(raw: str) -> Dict[str, str]:
+    return {k.lower(): dq or sq or bare for k, dq, sq, bare in _ATTR_RE.findall(raw)}
+
+def parse_all(html: str) -> Dict[str, Any]:
+    """
+    Collect everything the price parsers need in a single pass over the page
+    Returns: {"next_data": dict or None, "ld_scripts": [str], "meta": {key: content}}
+    """
+    scripts: List[Tuple[Dict[str, str], str]] = []
+    meta: Dict[str, Optional[str]] = {}
     
+    for m in _PAGE_TAG_RE.finditer(html):
+        if m.group(3) is None:
+            scripts.append((_attrs(m.group(1)), m.group(2)))
+            continue
+        # Only the first tag of each kind counts, as with soup.find
+        attrs = _attrs(m.group(4))
+        prop = attrs.get("property", "").lower()
+        if prop in _OG_PRICE_KEYS and m.group(3).lower() == "meta":
+            meta.setdefault(prop, attrs.get("content"))
+        itemprop = attrs.get("itemprop", "").lower()
+        if itemprop in _ITEMPROP_PRICE_KEYS:
+            meta.setdefault(itemprop, attrs.get("content"))
+    
+    ld_scripts = [body.strip() for attrs, body in scripts if attrs.get("type", "").lower() == "application/ld+json"]
+    return {"next_data": parse_next_json(scripts), "ld_scripts": ld_scripts, "meta": meta}
+
+def parse_next_json(scripts: List[Tuple[Dict[str, str], str]]) -> Optional[dict]:
+    """Parse PlayStation Next.js JSON with multiple fallback strategies"""
     # Strategy 1: Standard __NEXT_DATA__
-    tag = soup.find("script", id="__NEXT_DATA__", type="application/json")
-    if tag and tag.string:
-        try:
-            return json.loads(tag.string)
-        except Exception:
-            pass
+    for attrs, body in scripts:
+        if attrs.get("id") == "__NEXT_DATA__":
+            if body:
+                try:
+                    return orjson.loads(body)
+                except Exception:
+                    pass
+            break
     
     # Strategy 2: Look for any script with __NEXT_DATA__
-    all_scripts = soup.find_all("script")
-    for script in all_scripts:
-        if script.string and "__NEXT_DATA__" in script.string:
+    for attrs, body in scripts:
+        if "__NEXT_DATA__" in body:
             try:
                 # Extract JSON from script
-                match = re.search(r'({.*})', script.string, re.DOTALL)
+                match = _NEXT_JSON_BLOB_RE.search(body)
                 if match:
-                    return json.loads(match.group(1))
+                    return orjson.loads(match.group(1))
             except Exception:
                 continue
     
     # Strategy 3: Look for data in script without ID
-    for script in all_scripts:
-        if script.string and "pageProps" in script.string and "product" in script.string:
+    for attrs, body in scripts:
+        if "pageProps" in body and "product" in body:
             try:
-                return json.loads(script.string)
+                return orjson.loads(body)
             except Exception:
                 continue
     
     return None
 
+# Fields in the order they are trusted: (key, price type, debug tag, debug tag when a lower discountedPrice is also set)
+_PRICE_PRIORITY = (
+    ("basePrice", "MSRP", "used_base", "used_base_over_disc"),
+    ("finalPrice", "Current", "used_final", "used_final_as_msrp"),
+    ("actualPrice", "Current", "used_actual", "used_actual_as_msrp"),
+    ("discountedPrice", "Sale Price", "used_disc_only", None),
+    ("current", "Current", "used_current", None),
+    ("value", "Current", "used_value", None),
+)
+
 def extract_price_with_type(price_dict: dict) -> Tuple[Optional[float], str, str]:
     """
     Extract price from PlayStation price object with MAXIMUM basePrice priority
@@ -378,48 +514,56 @@ def extract_price_with_type(price_dict: dict) -> Tuple[Optional[float], str, str
     if not isinstance(price_dict, dict):
         return None, "Unknown", "not_dict"
     
-    # Extract ALL possible price fields
-    base = _num(price_dict.get("basePrice"))
-    disc = _num(price_dict.get("discountedPrice"))
-    final = _num(price_dict.get("finalPrice"))
-    current = _num(price_dict.get("current"))
-    value = _num(price_dict.get("value"))
-    actual = _num(price_dict.get("actualPrice"))
-    
-    debug = f"base={base},disc={disc},final={final},curr={current},val={value},act={actual}"
-    
-    # CRITICAL: ALWAYS use basePrice when it exists (this is MSRP)
-    if base and base > 0:
-        # If there's a discount active, basePrice is STILL the correct MSRP
-        if disc and disc > 0 and disc < base:
-            return base, "MSRP", f"{debug}|used_base_over_disc"
-        return base, "MSRP", f"{debug}|used_base"
-    
-    # If basePrice missing, try to infer MSRP from other fields
-    # Some regions put MSRP in finalPrice when no discount active
-    if final and final > 0:
-        # If discount exists and is less than final, final might be MSRP
-        if disc and disc > 0 and disc < final:
-            return final, "MSRP", f"{debug}|used_final_as_msrp"
-        return final, "Current", f"{debug}|used_final"
-    
-    # actualPrice might be MSRP in some regions
-    if actual and actual > 0:
-        if disc and disc > 0 and disc < actual:
-            return actual, "MSRP", f"{debug}|used_actual_as_msrp"
-        return actual, "Current", f"{debug}|used_actual"
-    
-    # Last resort: discounted price (this is a SALE price, not ideal)
-    if disc and disc > 0:
-        return disc, "Sale Price", f"{debug}|used_disc_only"
-    
-    # Fallback to any available field
-    if current and current > 0:
-        return current, "Current", f"{debug}|used_current"
-    if value and value > 0:
-        return value, "Current", f"{debug}|used_value"
-    
-    return None, "Unknown", f"{debug}|no_price_found"
+    get = price_dict.get
+    disc = _num(get("discountedPrice"))
+    
+    # Full field dump only when someone will read it
+    debug = ""
+    if DEBUG_MODE:
+        debug = (f"base={_num(get('basePrice'))},disc={disc},final={_num(get('finalPrice'))},"
+                 f"curr={_num(get('current'))},val={_num(get('value'))},act={_num(get('actualPrice'))}|")
+    
+    # basePrice is ALWAYS the MSRP when present; finalPrice/actualPrice are MSRP
+    # when a lower discountedPrice sits next to them; a lone discount is a SALE price
+    for key, price_type, tag, over_disc_tag in _PRICE_PRIORITY:
+        amount = disc if key == "discountedPrice" else _num(get(key))
+        if amount and amount > 0:
+            if over_disc_tag and disc and 0 < disc < amount:
+                return amount, "MSRP", debug + over_disc_tag
+            return amount, price_type, debug + tag
+    
+    return None, "Unknown", debug + "no_price_found"
+
+_PRICE_KEYS = ("basePrice", "discountedPrice", "finalPrice", "actualPrice")
+
+def _path_str(path) -> str:
+    """Render a (parent, key) chain as product.skus[0].price"""
+    parts = []
+    while path:
+        path, key = path
+        parts.append(f"[{key}]" if isinstance(key, int) else f".{key}")
+    return "".join(reversed(parts)).lstrip(".")
+
+def _own_price_key(key: Any) -> bool:
+    """Keys that stay on the product's own pricing: price itself and its SKU entries"""
+    return isinstance(key, str) and (key == "price" or "sku" in key.lower())
+
+def _find_price_dicts(product: dict):
+    """
+    Depth-first walk of the product's own price and SKU entries with an explicit stack
+    Only "price" and *sku* keys are followed, so add-on, upsell and related-product prices are never reached
+    Yields: (path, dict) for every dict under a "price" key or carrying a price field
+    """
+    stack = [(product, (None, "product"))]
+    while stack:
+        node, path = stack.pop()
+        if isinstance(node, dict):
+            if path[1] == "price" or any(k in node for k in _PRICE_KEYS):
+                yield _path_str(path), node
+                continue
+            stack.extend((v, (path, k)) for k, v in reversed(node.items()) if _own_price_key(k) and isinstance(v, (dict, list)))
+        elif isinstance(node, list):
+            stack.extend((node[i], (path, i)) for i in range(len(node) - 1, -1, -1) if isinstance(node[i], (dict, list)))
 
 def from_next_json(next_json: dict) -> Tuple[Optional[str], Optional[str], Optional[float], str, Optional[str], str]:
     """
@@ -434,7 +578,7 @@ def from_next_json(next_json: dict) -> Tuple[Optional[str], Optional[str], Optio
         title = product.get("name") or product.get("title") or page_props.get("title")
         pid = product.get("id") or product.get("productId") or product.get("slug") or page_props.get("productId")
 
-        # Try multiple locations for price data
+        # Try multiple locations for price data, MSRP locations first
         locations = [
             ("product.price", product.get("price") if isinstance(product, dict) else None),
             ("defaultSku.price", product.get("defaultSku", {}).get("price") if isinstance(product.get("defaultSku"), dict) else None),
@@ -449,31 +593,40 @@ def from_next_json(next_json: dict) -> Tuple[Optional[str], Optional[str], Optio
                 locations.append((f"skus[{idx}].price", sku.get("price")))
         
         # Try each location
+        tried = set()
         for location_name, price_obj in locations:
             if isinstance(price_obj, dict):
+                tried.add(id(price_obj))
                 price, price_type, debug = extract_price_with_type(price_obj)
                 currency = price_obj.get("currency")
                 if price and price > 0:
                     full_debug = f"{location_name}|{debug}"
                     return title, pid, price, price_type, currency, full_debug
         
+        # Fallback: the price moved somewhere else inside the product's own price/SKU data
+        for location_name, price_obj in _find_price_dicts(product):
+            if id(price_obj) in tried:
+                continue
+            price, price_type, debug = extract_price_with_type(price_obj)
+            currency = price_obj.get("currency")
+            if price and price > 0:
+                full_debug = f"walk:{location_name}|{debug}"
+                return title, pid, price, price_type, currency, full_debug
+        
         return title, pid, None, "Unknown", None, "no_valid_price_location"
     except Exception as e:
         return None, None, None, "Error", None, f"exception:{str(e)}"
 
-def parse_json_ld_enhanced(html: str) -> Tuple[Optional[str], Optional[float], Optional[str], str]:
+def parse_json_ld_enhanced(scripts: List[str]) -> Tuple[Optional[str], Optional[float], Optional[str], str]:
     """
     Enhanced JSON-LD parsing that tries to find basePrice/MSRP
     Returns: (title, price, currency, debug_info)
     """
-    soup = BeautifulSoup(html, "html.parser")
-    scripts = soup.find_all("script", type="application/ld+json")
-    
     debug_info = f"found_{len(scripts)}_ld_scripts"
     
     for idx, s in enumerate(scripts):
         try:
-            data = json.loads(s.string) if s.string else None
+            data = orjson.loads(s) if s else None
         except Exception:
             continue
         
@@ -524,25 +677,19 @@ def parse_json_ld_enhanced(html: str) -> Tuple[Optional[str], Optional[float], O
     
     return None, None, None, f"{debug_info}|no_valid_offers"
 
-def parse_meta_tags(html: str) -> Tuple[Optional[float], Optional[str], str]:
+def parse_meta_tags(meta: Dict[str, Optional[str]]) -> Tuple[Optional[float], Optional[str], str]:
     """Parse meta tags for price with debug info"""
-    soup = BeautifulSoup(html, "html.parser")
-    
-    meta_amt = soup.find("meta", property="og:price:amount")
-    meta_cur = soup.find("meta", property="og:price:currency")
-    if meta_amt and meta_amt.get("content"):
-        price = _num(meta_amt.get("content"))
-        currency = meta_cur.get("content") if meta_cur and meta_cur.get("content") else None
+    amt = meta.get("og:price:amount")
+    if amt:
+        price = _num(amt)
         if price is not None:
-            return price, currency, "og_price_amount"
+            return price, meta.get("og:price:currency") or None, "og_price_amount"
     
-    ip = soup.find(attrs={"itemprop":"price"})
-    ipcur = soup.find(attrs={"itemprop":"priceCurrency"})
-    if ip and ip.get("content"):
-        price = _num(ip.get("content"))
-        currency = ipcur.get("content") if ipcur and ipcur.get("content") else None
+    ip = meta.get("price")
+    if ip:
+        price = _num(ip)
         if price is not None:
-            return price, currency, "itemprop_price"
+            return price, meta.get("pricecurrency") or None, "itemprop_price"
     
     return None, None, "no_meta_tags"
 
@@ -552,70 +699,92 @@ def choose_currency(parsed: Optional[str], expected: Optional[str]) -> Optional[
         return expected.upper()
     return parsed.upper() if parsed else None
 
-def fetch_ps_price(product_id: str, country: str, title: str) -> Optional[PriceData]:
+def _parse_ps_page(html: str, country: str, currency: str, title: str, debug_log: List[str]) -> PriceData:
+    """Extract the price from a fetched PSN product page"""
+    debug_log.append("html_ok")
+    page = parse_all(html)
+    
+    # Try Next.js JSON first
+    nxt = page["next_data"]
+    if nxt:
+        debug_log.append("nextjs_found")
+        t, _, price, price_type, pcurr, parse_debug = from_next_json(nxt)
+        if price is not None and price > 0:
+            final_currency = choose_currency(pcurr, currency)
+            full_debug = "|".join(debug_log + ["next_json", parse_debug])
+            print(f"[PSN {country}] {title}: {price} {final_currency} ({price_type}) - {full_debug}")
+            return PriceData("PlayStation", title, country, final_currency, price, None, None, price_type, "next_json", full_debug)
+        else:
+            debug_log.append(f"nextjs_no_price:{parse_debug}")
+    else:
+        debug_log.append("nextjs_not_found")
+    
+    # Fallback to JSON-LD
+    t2, price2, pcurr2, ld_debug = parse_json_ld_enhanced(page["ld_scripts"])
+    if price2 is not None and price2 > 0:
+        final_currency = choose_currency(pcurr2, currency)
+        full_debug = "|".join(debug_log + ["json_ld", ld_debug])
+        print(f"[PSN {country}] {title}: {price2} {final_currency} (JSON-LD) - {full_debug}")
+        return PriceData("PlayStation", title, country, final_currency, price2, None, None, "Current", "json_ld", full_debug)
+    else:
+        debug_log.append(f"json_ld_no_price:{ld_debug}")
+    
+    # Fallback to meta tags
+    price3, pcurr3, meta_debug = parse_meta_tags(page["meta"])
+    if price3 is not None and price3 > 0:
+        final_currency = choose_currency(pcurr3, currency)
+        full_debug = "|".join(debug_log + ["meta", meta_debug])
+        return PriceData("PlayStation", title, country, final_currency, price3, None, None, "Current", "meta_tags", full_debug)
+    else:
+        debug_log.append(f"meta_no_price:{meta_debug}")
+    
+    # All methods failed
+    full_debug = "|".join(debug_log + ["all_failed"])
+    print(f"[PSN {country}] {title}: FAILED - {full_debug}")
+    return PriceData("PlayStation", title, country, currency, None, None, None, "N/A", None, full_debug)
+
+async def fetch_ps_price(client: StoreClient, product_id: str, country: str, title: str) -> Optional[PriceData]:
     """Fetch PlayStation price with robust MSRP extraction and debugging"""
     if country not in PS_MARKETS:
         return None
     
-    locale = PS_MARKETS[country]
     currency = PLATFORM_CURRENCIES["PlayStation"].get(country, "USD")
-    
-    headers = dict(PS_HEADERS)
-    if locale:
-        lang = locale.split("-")[0]
-        headers["Accept-Language"] = f"{lang}-{locale.split('-')[-1].upper()},{lang};q=0.8"
+    headers = _PS_HEADERS_BY_COUNTRY[country]
     
     debug_log = []
     
     try:
-        url = f"https://store.playstation.com/{locale}/product/{product_id}"
-        resp = requests.get(url, headers=headers, timeout=30)
+        url = _PS_URL_BY_COUNTRY[country].format(pid=product_id)
+        cached = client.page(url)
+        if cached:
+            etag, modified, checked_at, row = cached
+            if time.time() - checked_at < CACHE_TTL:
+                return replace(row, title=title)
+            # Stale: ask the store whether the page changed since we parsed it
+            headers = dict(headers)
+            if etag:
+                headers["If-None-Match"] = etag
+            if modified:
+                headers["If-Modified-Since"] = modified
+        
+        resp = await client.get(PS_HOST, url, headers=headers, timeout=30)
+        
+        # Unchanged page: reuse the stored parse
+        if resp.status_code == 304 and cached:
+            client.store_page(url, (etag, modified, time.time(), row))
+            return replace(row, title=title)
         
         if resp.status_code != 200:
             debug_log.append(f"http_{resp.status_code}")
             return PriceData("PlayStation", title, country, currency, None, None, None, "N/A", None, "|".join(debug_log))
         
-        html = resp.text
-        debug_log.append("html_ok")
-        
-        # Try Next.js JSON first
-        nxt = parse_next_json(html)
-        if nxt:
-            debug_log.append("nextjs_found")
-            t, _, price, price_type, pcurr, parse_debug = from_next_json(nxt)
-            if price is not None and price > 0:
-                final_currency = choose_currency(pcurr, currency)
-                full_debug = "|".join(debug_log + ["next_json", parse_debug])
-                print(f"[PSN {country}] {title}: {price} {final_currency} ({price_type}) - {full_debug}")
-                return PriceData("PlayStation", title, country, final_currency, price, None, None, price_type, "next_json", full_debug)
-            else:
-                debug_log.append(f"nextjs_no_price:{parse_debug}")
+        result = _parse_ps_page(resp.text, country, currency, title, debug_log)
+        # Only real prices are kept, so a challenge page or partial render is retried on the next pull
+        if result.price is not None:
+            client.store_page(url, (resp.headers.get("ETag"), resp.headers.get("Last-Modified"), time.time(), result))
         else:
-            debug_log.append("nextjs_not_found")
-        
-        # Fallback to JSON-LD
-        t2, price2, pcurr2, ld_debug = parse_json_ld_enhanced(html)
-        if price2 is not None and price2 > 0:
-            final_currency = choose_currency(pcurr2, currency)
-            full_debug = "|".join(debug_log + ["json_ld", ld_debug])
-            print(f"[PSN {country}] {title}: {price2} {final_currency} (JSON-LD) - {full_debug}")
-            return PriceData("PlayStation", title, country, final_currency, price2, None, None, "Current", "json_ld", full_debug)
-        else:
-            debug_log.append(f"json_ld_no_price:{ld_debug}")
-        
-        # Fallback to meta tags
-        price3, pcurr3, meta_debug = parse_meta_tags(html)
-        if price3 is not None and price3 > 0:
-            final_currency = choose_currency(pcurr3, currency)
-            full_debug = "|".join(debug_log + ["meta", meta_debug])
-            return PriceData("PlayStation", title, country, final_currency, price3, None, None, "Current", "meta_tags", full_debug)
-        else:
-            debug_log.append(f"meta_no_price:{meta_debug}")
-        
-        # All methods failed
-        full_debug = "|".join(debug_log + ["all_failed"])
-        print(f"[PSN {country}] {title}: FAILED - {full_debug}")
-        return PriceData("PlayStation", title, country, currency, None, None, None, "N/A", None, full_debug)
+            client.pages.pop(url, None)
+        return result
                 
     except Exception as e:
         debug_log.append(f"exception:{str(e)[:50]}")
@@ -627,50 +796,46 @@ def fetch_ps_price(product_id: str, country: str, title: str) -> Optional[PriceD
 # MAIN PULL ORCHESTRATION
 # ============================================================================
 
-def pull_all_prices(steam_games: List[Tuple[str, str]], 
-                   xbox_games: List[Tuple[str, str]], 
-                   ps_games: List[Tuple[str, str]],
-                   max_workers: int = 20) -> Tuple[List[PriceData], List[PriceData], List[PriceData]]:
-    """Pull prices for all games across all platforms and regions"""
+async def _pull_all(client: StoreClient,
+                    steam_games: List[Tuple[str, str]], 
+                    xbox_games: List[Tuple[str, str]], 
+                    ps_games: List[Tuple[str, str]]) -> Tuple[List[PriceData], List[PriceData], List[PriceData]]:
+    """Run every (platform, game, country) fetch concurrently on the client's loop"""
+    jobs = []
+    platforms = []
     
-    steam_results = []
-    xbox_results = []
-    ps_results = []
+    # Steam jobs
+    for appid, title in steam_games:
+        for country in STEAM_MARKETS.keys():
+            jobs.append(fetch_steam_price(client, appid, country, title))
+            platforms.append("steam")
     
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = []
-        
-        # Submit Steam jobs
-        for appid, title in steam_games:
-            for country in STEAM_MARKETS.keys():
-                futures.append((executor.submit(fetch_steam_price, appid, country, title), "steam"))
-        
-        # Submit Xbox jobs
-        for store_id, title in xbox_games:
-            for country in XBOX_MARKETS.keys():
-                futures.append((executor.submit(fetch_xbox_price, store_id, country, title), "xbox"))
-        
-        # Submit PlayStation jobs
-        for product_id, title in ps_games:
-            for country in PS_MARKETS.keys():
-                futures.append((executor.submit(fetch_ps_price, product_id, country, title), "ps"))
-        
-        # Collect results
-        for future_tuple in futures:
-            future, platform = future_tuple
-            try:
-                result = future.result()
-                if result:
-                    if platform == "steam":
-                        steam_results.append(result)
-                    elif platform == "xbox":
-                        xbox_results.append(result)
-                    elif platform == "ps":
-                        ps_results.append(result)
-            except Exception:
-                pass
+    # Xbox jobs
+    for store_id, title in xbox_games:
+        for country in XBOX_MARKETS.keys():
+            jobs.append(fetch_xbox_price(client, store_id, country, title))
+            platforms.append("xbox")
+    
+    # PlayStation jobs
+    for product_id, title in ps_games:
+        for country in PS_MARKETS.keys():
+            jobs.append(fetch_ps_price(client, product_id, country, title))
+            platforms.append("ps")
+    
+    by_platform = {"steam": [], "xbox": [], "ps": []}
+    results = await asyncio.gather(*jobs, return_exceptions=True)
+    for platform, result in zip(platforms, results):
+        if result and not isinstance(result, BaseException):
+            by_platform[platform].append(result)
     
-    return steam_results, xbox_results, ps_results
+    return by_platform["steam"], by_platform["xbox"], by_platform["ps"]
+
+def pull_all_prices(steam_games: List[Tuple[str, str]], 
+                   xbox_games: List[Tuple[str, str]], 
+                   ps_games: List[Tuple[str, str]]) -> Tuple[List[PriceData], List[PriceData], List[PriceData]]:
+    """Pull prices for all games across all platforms and regions"""
+    loop, client = get_store_client()
+    return asyncio.run_coroutine_threadsafe(_pull_all(client, steam_games, xbox_games, ps_games), loop).result()
 
 def process_results(results: List[PriceData], rates: Dict[str, float]) -> pd.DataFrame:
     """Process results into DataFrame with USD conversion and variance"""
@@ -681,42 +846,28 @@ def process_results(results: List[PriceData], rates: Dict[str, float]) -> pd.Dat
     for r in results:
         r.price_usd = convert_to_usd(r.price, r.currency, rates)
     
-    # Find US baseline
-    us_prices = {}
-    for r in results:
-        if r.country == "US" and r.price_usd:
-            us_prices[r.title] = r.price_usd
+    # Convert to DataFrame, one list per column; the variance column is filled in below
+    display = ["Title", "Country", "Currency", "Local Price", "USD Price"]
+    # Add debug columns if enabled
+    if DEBUG_MODE:
+        display += ["Price Type", "Source", "Debug Info"]  # Debug Info: full debug trail
+    rows = [(r.title, r.country, r.currency, r.price, r.price_usd)
+            + ((r.price_type, r.source, r.debug_info) if DEBUG_MODE else ())
+            for r in results]
+    
+    df = pd.DataFrame(dict(zip(display, map(list, zip(*rows)))))
+    
+    # Broadcast each title's US price to all of its rows in one groupby pass
+    usd = df["USD Price"].astype(float)
+    has_usd = usd.notna() & (usd != 0)
+    us_price = usd.where(has_usd & (df["Country"] == "US")).groupby(df["Title"]).transform("last")
     
     # Calculate variance
-    for r in results:
-        if r.price_usd and r.title in us_prices:
-            us_price = us_prices[r.title]
-            if us_price > 0:
-                pct = ((r.price_usd / us_price) - 1) * 100
-                r.diff_vs_us = f"{pct:+.1f}%"
-    
-    # Convert to DataFrame
-    df_data = []
-    for r in results:
-        row = {
-            "Title": r.title,
-            "Country": COUNTRY_NAMES.get(r.country, r.country),
-            "Currency": r.currency,
-            "Local Price": r.price if r.price is not None else None,
-            "USD Price": r.price_usd if r.price_usd is not None else None,
-            "% Diff vs US": r.diff_vs_us if r.diff_vs_us else None
-        }
-        
-        # Add debug columns if enabled
-        if DEBUG_MODE:
-            row["Price Type"] = r.price_type
-            row["Source"] = r.source
-            row["Debug Info"] = r.debug_info  # NEW: Full debug trail
-        
-        df_data.append(row)
+    pct = (usd / us_price.where(us_price > 0) - 1) * 100
+    df.insert(5, "% Diff vs US", pct.where(has_usd).map(lambda x: f"{x:+.1f}%" if pd.notna(x) else None))
     
-    df = pd.DataFrame(df_data)
-    return df.sort_values(["Title", "Country"]).reset_index(drop=True)
+    df["Country"] = df["Country"].map(lambda c: COUNTRY_NAMES.get(c, c))
+    return df.sort_values(["Title", "Country"], kind="mergesort", ignore_index=True)
 
 # ============================================================================
 # STREAMLIT UI